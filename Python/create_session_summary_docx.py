@@ -11,13 +11,14 @@ This script generates Session_Summary_Analysis.docx with details on:
 - Key results and statistics
 """
 
-from docx import Document
-from docx.shared import Pt, RGBColor, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 from datetime import datetime
 
 
 def main():
+    # python-docx is imported here so the module loads without it
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
     # Create document
     doc = Document()
 
@@ -2,80 +2,328 @@
 """Merge multiple Session_Summary_Analysis .docx files into a single combined document.
 
 This script looks for files matching Session_Summary_Analysis* in the Documentation/ folder,
-appends them in chronological order, and writes Combined_Session_Summary_Analysis_{date}.docx
+appends them in chronological order (the date in the file name, MMDDYYYY or YYYYMMDD),
+and writes Combined_Session_Summary_Analysis_{date}.docx
+
+The merge is incremental.  Each source becomes one section of the combined document:
+a heading with the file name followed by deep copies of the source's body elements
+(paragraphs and tables as XML, so run, cell and table formatting is kept).
+Images, links, styles and list numbering definitions the copied elements
+refer to are carried over with them.
+A manifest next to the output records the content hash of every merged source,
+how many body elements its section holds and the list numbering definitions it
+added.  On the next run only new or changed sources are opened and their sections
+inserted or replaced; unchanged sources are not read again.  A dropped section
+takes its numbering definitions and any images or links no other section uses
+with it, so the combined document does not grow with orphaned parts.  Use --full to rebuild from scratch.  python-docx is imported only
+when a merge runs.
 """
-from docx import Document
-from docx.oxml.shared import OxmlElement, qn
 from pathlib import Path
 from datetime import date
+import argparse
+import copy
+import hashlib
+import io
+import json
 import re
 
 DOC_DIR = Path(__file__).resolve().parent.parent / "Documentation"
 OUT_TEMPLATE = "Combined_Session_Summary_Analysis_{}.docx"
+MANIFEST_NAME = "Combined_Session_Summary_Analysis.manifest.json"
+MANIFEST_VERSION = 2
 
+_DATE_RE = re.compile(r"(\d{8})")
 
-def iter_block_items(parent):
-    """Yield each paragraph or table element from a Document or cell.
-    Adapted from python-docx docs/recipes.
-    """
-    from docx.text.paragraph import Paragraph
-    from docx.table import Table
-    for child in parent.element.body.iterchildren():
-        if child.tag.endswith('}p'):
-            yield Paragraph(child, parent)
-        elif child.tag.endswith('}tbl'):
-            yield Table(child, parent)
-
-
-def copy_paragraph(src_p, dst_doc):
-    """Copy paragraph text and basic style to dst_doc as a new paragraph."""
-    p = dst_doc.add_paragraph()
-    if src_p.style is not None:
-        try:
-            p.style = src_p.style
-        except Exception:
-            pass
-    for run in src_p.runs:
-        r = p.add_run(run.text)
+
+def filename_date(name):
+    """Date in a session file name: YYYYMMDD (20251227) or MMDDYYYY (11162025); None if absent."""
+    m = _DATE_RE.search(name)
+    if not m:
+        return None
+    s = m.group(1)
+    for y, mo, d in ((s[:4], s[4:6], s[6:]), (s[4:], s[:2], s[2:4])):
         try:
-            r.bold = run.bold
-            r.italic = run.italic
-            r.underline = run.underline
-            r.font.size = run.font.size
-            r.font.name = run.font.name
-        except Exception:
+            return date(int(y), int(mo), int(d))
+        except ValueError:
             pass
-    # copy alignment
-    try:
-        p.alignment = src_p.alignment
-    except Exception:
-        pass
-    return p
-
-
-def copy_table(src_tbl, dst_doc):
-    rows = len(src_tbl.rows)
-    cols = len(src_tbl.columns)
-    tbl = dst_doc.add_table(rows=rows, cols=cols)
-    tbl.style = src_tbl.style
-    for i, row in enumerate(src_tbl.rows):
-        for j, cell in enumerate(row.cells):
-            # join paragraphs in cell
-            text = '\n'.join(p.text for p in cell.paragraphs)
-            tbl.cell(i, j).text = text
-    return tbl
-
-
-def find_session_files():
+    return None
+
+
+def find_session_files(doc_dir=DOC_DIR):
     pattern = re.compile(r"Session_Summary_Analysis.*\.docx$")
-    files = [f for f in DOC_DIR.iterdir() if f.is_file() and pattern.match(f.name)]
-    # sort by modified time (oldest first)
-    files.sort(key=lambda p: p.stat().st_mtime)
+    files = [f for f in doc_dir.iterdir() if f.is_file() and pattern.match(f.name)]
+    # oldest first by the date in the file name; undated files last, by name
+    files.sort(key=lambda p: (filename_date(p.name) is None, filename_date(p.name) or date.min, p.name))
     return files
 
 
-def main():
-    files = find_session_files()
+def file_hash(path, previous=None):
+    """SHA-256 of the file, reusing ``previous`` (a manifest entry) when size and mtime are unchanged."""
+    st = path.stat()
+    if previous and previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns:
+        return previous['sha256']
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def load_manifest(doc_dir):
+    path = doc_dir / MANIFEST_NAME
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text())
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def save_manifest(doc_dir, output, sources):
+    manifest = dict(version=MANIFEST_VERSION, output=output, sources=sources)
+    (doc_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=1) + '\n')
+
+
+def body_elements(doc):
+    """Block elements of the document body, without the trailing section properties."""
+    from docx.oxml.ns import qn
+    return [el for el in doc.element.body.iterchildren() if el.tag != qn('w:sectPr')]
+
+
+def _is_empty_paragraph(el):
+    from docx.oxml.ns import qn
+    return el.tag == qn('w:p') and not ''.join(el.itertext()).strip() and not el.xpath('.//w:drawing')
+
+
+def _copy_styles(src_doc, dst_doc):
+    """Add the style definitions of ``src_doc`` that ``dst_doc`` lacks (matched by style id); return them."""
+    from docx.oxml.ns import qn
+    dst_styles = dst_doc.styles.element
+    have = {s.get(qn('w:styleId')) for s in dst_styles.iterchildren(qn('w:style'))}
+    added = []
+    for style in src_doc.styles.element.iterchildren(qn('w:style')):
+        if style.get(qn('w:styleId')) not in have:
+            added.append(copy.deepcopy(style))
+            dst_styles.append(added[-1])
+    return added
+
+
+def _copy_numbering(src_doc, dst_doc, nodes):
+    """Copy the list definitions that ``nodes`` reference from ``src_doc`` and renumber them.
+
+    Every referenced w:num and its w:abstractNum are added to the destination's
+    numbering part under fresh ids, and the w:numId references in ``nodes``
+    are rewritten to match, so copied lists keep their numbering format and
+    restart independently of the lists already in the document.  Returns the
+    new numIds.
+    """
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    from docx.oxml.ns import qn
+
+    refs = [ref for node in nodes for ref in node.iter(qn('w:numId'))]
+    used = {ref.get(qn('w:val')) for ref in refs} - {'0'}  # numId 0 switches numbering off
+    if not used:
+        return []
+    try:
+        src_numbering = src_doc.part.part_related_by(RT.NUMBERING).element
+    except KeyError:
+        return []
+    dst_numbering = dst_doc.part.numbering_part.element
+
+    src_abstract = {a.get(qn('w:abstractNumId')): a for a in src_numbering.iterchildren(qn('w:abstractNum'))}
+    next_abstract = 1 + max((int(a.get(qn('w:abstractNumId')))
+                             for a in dst_numbering.iterchildren(qn('w:abstractNum'))), default=-1)
+    abstract_ids, num_ids = {}, {}
+    for num in src_numbering.iterchildren(qn('w:num')):
+        old_id = num.get(qn('w:numId'))
+        if old_id not in used:
+            continue
+        ref = num.find(qn('w:abstractNumId'))
+        old_abstract = ref.get(qn('w:val'))
+        if old_abstract not in abstract_ids and old_abstract in src_abstract:
+            abstract = copy.deepcopy(src_abstract[old_abstract])
+            abstract.set(qn('w:abstractNumId'), str(next_abstract))
+            # w:nsid ties lists together across documents; drop it so Word keeps the copy separate
+            for nsid in abstract.findall(qn('w:nsid')):
+                abstract.remove(nsid)
+            # abstract definitions precede every w:num in numbering.xml
+            first_num = dst_numbering.find(qn('w:num'))
+            if first_num is not None:
+                first_num.addprevious(abstract)
+            else:
+                dst_numbering.append(abstract)
+            abstract_ids[old_abstract] = str(next_abstract)
+            next_abstract += 1
+        new = copy.deepcopy(num)
+        new.set(qn('w:numId'), str(dst_numbering._next_numId))
+        new.find(qn('w:abstractNumId')).set(qn('w:val'), abstract_ids.get(old_abstract, old_abstract))
+        nums = dst_numbering.num_lst
+        if nums:
+            nums[-1].addnext(new)
+        else:
+            dst_numbering.append(new)
+        num_ids[old_id] = new.get(qn('w:numId'))
+    for ref in refs:
+        val = ref.get(qn('w:val'))
+        if val in num_ids:
+            ref.set(qn('w:val'), num_ids[val])
+    return list(num_ids.values())
+
+
+def _drop_numbering(doc, num_ids):
+    """Remove the w:num entries ``num_ids`` and the abstract definitions only they used."""
+    from docx.oxml.ns import qn
+    if not num_ids:
+        return
+    numbering = doc.part.numbering_part.element
+    dropped = set()
+    for num in list(numbering.iterchildren(qn('w:num'))):
+        if num.get(qn('w:numId')) in num_ids:
+            dropped.add(num.find(qn('w:abstractNumId')).get(qn('w:val')))
+            numbering.remove(num)
+    still_used = {num.find(qn('w:abstractNumId')).get(qn('w:val')) for num in numbering.iterchildren(qn('w:num'))}
+    for abstract in list(numbering.iterchildren(qn('w:abstractNum'))):
+        if abstract.get(qn('w:abstractNumId')) in dropped - still_used:
+            numbering.remove(abstract)
+
+
+def _drop_unused_rels(part):
+    """Drop image and external link relationships that no element of ``part`` refers to any more."""
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    from docx.oxml.ns import qn
+    rel_attrs = (qn('r:embed'), qn('r:id'), qn('r:link'))
+    referenced = {node.get(attr) for node in part.element.iter() for attr in rel_attrs}
+    for rid, rel in list(part.rels.items()):
+        if rid not in referenced and (rel.reltype == RT.IMAGE or rel.is_external):
+            del part.rels[rid]
+
+
+def _relink(el, src_part, dst_part):
+    """Point the relationship ids in a copied element at the destination part.
+
+    Images are added to the destination package (deduplicated by hash) and
+    external links re-created; other references are left unchanged.
+    """
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    from docx.oxml.ns import qn
+
+    rel_attrs = (qn('r:embed'), qn('r:id'), qn('r:link'))
+    for node in el.iter():
+        for attr in rel_attrs:
+            rid = node.get(attr)
+            if rid is None or rid not in src_part.rels:
+                continue
+            rel = src_part.rels[rid]
+            if rel.is_external:
+                node.set(attr, dst_part.relate_to(rel.target_ref, rel.reltype, is_external=True))
+            elif rel.reltype == RT.IMAGE:
+                new_rid, _ = dst_part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+                node.set(attr, new_rid)
+
+
+def build_section(path, dst_doc):
+    """Append the section for one source to ``dst_doc``; return its body elements and added numIds."""
+    from docx import Document
+    src = Document(path)
+    styles = _copy_styles(src, dst_doc)
+    heading = dst_doc.add_heading(path.name, level=2)
+    elements = [heading._p]
+    for el in body_elements(src):
+        # skip empty paragraphs, as the run-by-run copy did
+        if _is_empty_paragraph(el):
+            continue
+        el = copy.deepcopy(el)
+        _relink(el, src.part, dst_doc.part)
+        elements[-1].addnext(el)
+        elements.append(el)
+    num_ids = _copy_numbering(src, dst_doc, styles + elements[1:])
+    return elements, num_ids
+
+
+def _set_page_breaks(doc, sources):
+    """Start every section but the first on a new page (the heading's page_break_before)."""
+    blocks = body_elements(doc)
+    offset = 0
+    for i, entry in enumerate(sources):
+        heading = blocks[offset]
+        pPr = heading.get_or_add_pPr()
+        pPr.pageBreakBefore_val = True if i > 0 else None
+        offset += entry['blocks']
+
+
+def merge(files, doc_dir=DOC_DIR, full=False):
+    """Merge ``files`` (in order) into the combined document; return (path, n_added, n_replaced, n_removed)."""
+    from docx import Document
+
+    manifest = None if full else load_manifest(doc_dir)
+    previous = {e['name']: e for e in manifest['sources']} if manifest else {}
+    wanted = []
+    for f in files:
+        st = f.stat()
+        wanted.append(dict(name=f.name, sha256=file_hash(f, previous.get(f.name)),
+                           size=st.st_size, mtime_ns=st.st_mtime_ns, blocks=0, num_ids=[]))
+
+    base = doc_dir / manifest['output'] if manifest else None
+    out_doc = Document(base) if base is not None and base.exists() else None
+    if out_doc is not None:
+        old_sources = manifest['sources']
+        unchanged = {(e['name'], e['sha256']) for e in wanted}
+        kept_old = [e['name'] for e in old_sources if (e['name'], e['sha256']) in unchanged]
+        kept_new = [e['name'] for e in wanted if e['name'] in set(kept_old)]
+        if len(body_elements(out_doc)) != sum(e['blocks'] for e in old_sources) or kept_old != kept_new:
+            out_doc = None  # edited by hand or reordered: rebuild
+    if out_doc is None:
+        out_doc, old_sources = Document(), []
+
+    # sections of the current document, in order: name -> (entry, elements)
+    blocks = body_elements(out_doc)
+    sections, offset = {}, 0
+    for entry in old_sources:
+        sections[entry['name']] = (entry, blocks[offset:offset + entry['blocks']])
+        offset += entry['blocks']
+
+    # drop the sections of removed or changed sources
+    wanted_hash = {e['name']: e['sha256'] for e in wanted}
+    n_removed = n_replaced = n_built = 0
+    for name, (entry, elements) in list(sections.items()):
+        if wanted_hash.get(name) == entry['sha256']:
+            continue
+        for el in elements:
+            el.getparent().remove(el)
+        _drop_numbering(out_doc, entry.get('num_ids', []))
+        del sections[name]
+        if name in wanted_hash:
+            n_replaced += 1
+        else:
+            n_removed += 1
+    if n_replaced or n_removed:
+        _drop_unused_rels(out_doc.part)
+
+    # walk the wanted order; new or changed sources are built and moved in front of the next kept section
+    anchor = None
+    for entry in reversed(wanted):
+        if entry['name'] in sections:
+            old, elements = sections[entry['name']]
+            entry['blocks'] = old['blocks']
+            entry['num_ids'] = old.get('num_ids', [])
+            anchor = elements[0]
+            continue
+        elements, entry['num_ids'] = build_section(doc_dir / entry['name'], out_doc)
+        entry['blocks'] = len(elements)
+        if anchor is not None:
+            for el in elements:
+                anchor.addprevious(el)
+        anchor = elements[0]
+        n_built += 1
+    _set_page_breaks(out_doc, wanted)
+
+    out_name = OUT_TEMPLATE.format(date.today().strftime("%Y%m%d"))
+    out_doc.save(doc_dir / out_name)
+    save_manifest(doc_dir, out_name, wanted)
+    return doc_dir / out_name, n_built - n_replaced, n_replaced, n_removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--full', action='store_true', help='ignore the manifest and rebuild from scratch')
+    parser.add_argument('--doc-dir', type=Path, default=DOC_DIR, help='folder with the session summaries')
+    args = parser.parse_args(argv)
+
+    files = find_session_files(args.doc_dir)
     if not files:
         print("No session summary files found in Documentation/ (pattern: Session_Summary_Analysis*.docx)")
         return 1
@@ -83,32 +331,12 @@ def main():
     for f in files:
         print(" -", f.name)
 
-    out_doc = Document()
-
-    for idx, f in enumerate(files, 1):
-        src = Document(f)
-        # Add source heading and page break if not first
-        if idx > 1:
-            out_doc.add_page_break()
-        heading = out_doc.add_heading(f.name, level=2)
-        heading.alignment = None
-
-        # Copy blocks
-        for block in iter_block_items(src):
-            from docx.text.paragraph import Paragraph
-            from docx.table import Table
-            if isinstance(block, Paragraph):
-                # skip empty paragraph that's only the heading we added
-                if block.text.strip():
-                    copy_paragraph(block, out_doc)
-            elif isinstance(block, Table):
-                copy_table(block, out_doc)
-
-    out_name = DOC_DIR / OUT_TEMPLATE.format(date.today().strftime("%Y%m%d"))
-    out_doc.save(out_name)
+    out_name, n_added, n_replaced, n_removed = merge(files, args.doc_dir, full=args.full)
+    print(f"Merged {n_added} new, {n_replaced} changed, removed {n_removed}; "
+          f"{len(files) - n_added - n_replaced} unchanged")
     print(f"Combined document written: {out_name}")
     return 0
 
 
 if __name__ == '__main__':
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,8 @@
+"""Monte Carlo engines for the Sumerian Kings star & Drake analysis.
+
+The notebooks in ``Jupyter/`` import the reusable pieces from here, e.g.
+
+    from sumerian_kings.spiral_arms import load_arm_params, in_arm_mask
+"""
+
+__version__ = "1.0.0"
@@ -0,0 +1,287 @@
+"""
+Benchmarks for the Monte Carlo kernels, with a stored history.
+
+Each benchmark sets up its inputs (outside the timed region) for a problem
+size ``n`` and times one call of the kernel the notebooks and the pipeline
+run in production:
+
+    shell        shell sampling and the Galactocentric transform (``iter_shell_chunks``)
+    arms         spiral-arm membership against Data/reid_arms.csv (``in_arm_mask``)
+    density      density-grid binning of weighted points (``DensityGrid.add``)
+    drake        prior sampling, per-star p and P(>=1) (``sample_priors`` ... ``prob_at_least_one``)
+    drake_grid   the deterministic (L, f_i, f_l) grid with ~n cells (``evaluate_grid``)
+    kings        the truncated-speed Monte Carlo, n samples per king (``run_kings``)
+
+The import cases time the cold start a batch job or parallel worker pays
+before any sampling: importing the NumPy-only engines (``import_core``), the
+pipeline and process pool (``import_pipeline``) and NumPy alone
+(``import_numpy``) in a fresh interpreter.  They are recorded with size 0
+and also list any optional dependency (matplotlib, pandas, scipy, plotly,
+kaleido, docx) the imports pulled in, which should be none.
+
+Every (benchmark, size) case runs in a fresh process so its peak RSS is its
+own; the best of ``repeat`` calls gives the time and samples/second.  Records
+are appended to ``Results/benchmarks/history.jsonl`` with the git commit,
+package version and a machine key, and ``compare`` flags cases that are
+slower (or use more memory) than the median of the recent history for the
+same machine:
+
+    sumerian-kings bench                        # all benchmarks at 1e4 .. 1e7
+    sumerian-kings bench drake kings --sizes 1e5 1e6
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+
+from . import __version__, paths
+from .telemetry import git_commit, machine_key, peak_rss_mb
+
+
+SIZES = (10**4, 10**5, 10**6, 10**7)
+REPEAT = 3
+TOLERANCE = 0.25  # fractional slow-down / memory growth reported as a regression
+WINDOW = 5        # history records per case that form the baseline
+SEED = 12345
+
+
+def history_path(results=None):
+    return Path(results or paths.results_dir()) / 'benchmarks' / 'history.jsonl'
+
+
+# --- benchmarks -------------------------------------------------------------
+# Each returns (call, n_items): a zero-argument callable to time and the
+# number of samples (or grid cells) one call processes.
+
+def _shell_args():
+    """Default pipeline config and the (r1, r2, R0_pc, sigma0, Rd, hz) shell arguments."""
+    from .pipeline import DEFAULT_CONFIG as cfg
+    from .shell import LY_TO_PC, compute_sigma0
+    r1, r2 = cfg['r1_ly'] * LY_TO_PC, cfg['r2_ly'] * LY_TO_PC
+    sigma0 = compute_sigma0(cfg['N_total_G'], cfg['Rd'], cfg['Rmax'])
+    return cfg, (r1, r2, cfg['R0_pc'], sigma0, cfg['Rd'], cfg['hz'])
+
+
+def _shell_columns(n, args, names):
+    """Only the named columns of ``n`` shell samples, so setup does not dominate peak RSS."""
+    from .shell import iter_shell_chunks
+    parts = {name: [] for name in names}
+    for chunk in iter_shell_chunks(n, *args, seed=SEED):
+        for name in names:
+            parts[name].append(chunk[name])
+    return [np.concatenate(parts[name]) for name in names]
+
+
+def bench_shell(n, root):
+    from .shell import iter_shell_chunks
+    _, args = _shell_args()
+
+    def call():
+        for _ in iter_shell_chunks(n, *args, seed=SEED):
+            pass
+    return call, n
+
+
+def bench_arms(n, root):
+    from .spiral_arms import in_arm_mask, load_arm_params
+    cfg, args = _shell_args()
+    arm_params = load_arm_params(paths.data_dir(root) / cfg['arm_csv'])
+    R_gc, phi_gc = _shell_columns(n, args, ('R_gc', 'phi_gc'))
+    return lambda: in_arm_mask(R_gc, phi_gc, arm_params, cfg['arm_half_width']), n
+
+
+def bench_density(n, root):
+    from .density_grid import DensityGrid
+    cfg, args = _shell_args()
+    x, y, w = _shell_columns(n, args, ('x_sun', 'y_sun', 'rho'))
+    in_arm = np.random.default_rng(SEED).random(n) < 0.2
+    r2 = args[1]
+    grid = DensityGrid((-r2, r2), (-r2, r2), nbins=cfg['density_nbins'], n_levels=cfg['density_levels'])
+    return lambda: grid.add(x, y, w, in_arm), n
+
+
+def bench_drake(n, root):
+    from . import drake
+
+    def call():
+        streams = drake.prior_streams(SEED)
+        s = drake.sample_priors(n, streams)
+        p = drake.per_star_probability(s['f_l'], s['f_i'], s['f_c'], s['L'])
+        return drake.prob_at_least_one(p, 1.0e8)
+    return call, n
+
+
+def bench_drake_grid(n, root):
+    from . import drake
+    from .pipeline import DEFAULT_CONFIG as cfg
+    L_values = cfg['L_values']
+    side = max(2, int(round(np.sqrt(n / len(L_values)))))
+    values = np.logspace(-6, 0, side)
+    call = lambda: drake.evaluate_grid(1.0e8, L=L_values, f_i=values, f_l=values, f_c=cfg['fc_fixed'])
+    return call, len(L_values) * side * side
+
+
+def bench_kings(n, root):
+    from . import kings
+    from .pipeline import DEFAULT_CONFIG as cfg
+    _, reigns = kings.load_reigns(paths.data_dir(root) / cfg['kings_csv'])
+    return lambda: kings.run_kings(reigns, n, seed=SEED), n * len(reigns)
+
+
+BENCHMARKS = {
+    'shell': bench_shell,
+    'arms': bench_arms,
+    'density': bench_density,
+    'drake': bench_drake,
+    'drake_grid': bench_drake_grid,
+    'kings': bench_kings,
+}
+
+# import cases: the modules imported together in one fresh interpreter
+IMPORTS = {
+    'import_numpy': ('numpy',),
+    'import_core': ('sumerian_kings.shell', 'sumerian_kings.spiral_arms', 'sumerian_kings.drake',
+                    'sumerian_kings.kings'),
+    'import_pipeline': ('sumerian_kings.pipeline', 'sumerian_kings.parallel'),
+}
+OPTIONAL_MODULES = ('matplotlib', 'pandas', 'scipy', 'plotly', 'kaleido', 'docx')
+
+_IMPORT_SCRIPT = '''
+import sys, time
+t0 = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+elapsed = time.perf_counter() - t0
+import json
+from sumerian_kings.telemetry import peak_rss_mb
+loaded = [m for m in %r if m in sys.modules]
+print(json.dumps(dict(time_s=elapsed, loaded=loaded, peak_rss_mb=peak_rss_mb())))
+''' % (OPTIONAL_MODULES,)
+
+
+# --- running ----------------------------------------------------------------
+
+def run_case(name, size, repeat=REPEAT, root=None):
+    """Time one benchmark at one size in this process; returns a record dict."""
+    call, n_items = BENCHMARKS[name](size, root)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - t0)
+    best = min(times)
+    return dict(benchmark=name, size=size, n_items=n_items, time_s=best,
+                median_time_s=statistics.median(times), repeat=repeat,
+                samples_per_s=n_items / best if best > 0 else None, peak_rss_mb=peak_rss_mb())
+
+
+def run_import_case(name, repeat=REPEAT):
+    """Time the imports of one ``IMPORTS`` case, each repeat in a new interpreter; returns a record dict."""
+    modules = IMPORTS[name]
+    env = dict(os.environ)
+    package_dir = str(Path(__file__).resolve().parents[1])
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (package_dir, env.get('PYTHONPATH'))))
+    times, process_times = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT, *modules], env=env, check=True,
+                             capture_output=True, text=True).stdout
+        process_times.append(time.perf_counter() - t0)
+        child = json.loads(out.splitlines()[-1])
+        times.append(child['time_s'])
+    best = min(times)
+    return dict(benchmark=name, size=0, n_items=len(modules), time_s=best,
+                median_time_s=statistics.median(times), repeat=repeat, samples_per_s=None,
+                peak_rss_mb=child['peak_rss_mb'],
+                process_s=min(process_times), optional_modules=child['loaded'])
+
+
+def run_benchmarks(names=None, sizes=SIZES, repeat=REPEAT, root=None, log=print):
+    """Run every (benchmark, size) case and import case in a fresh process; returns the records."""
+    root = Path(root or paths.PROJECT_ROOT)
+    names = list(names or (*BENCHMARKS, *IMPORTS))
+    unknown = set(names) - set(BENCHMARKS) - set(IMPORTS)
+    if unknown:
+        raise KeyError(f"Unknown benchmark(s) {sorted(unknown)}; "
+                       f"benchmarks: {', '.join((*BENCHMARKS, *IMPORTS))}")
+    common = dict(commit=git_commit(root), version=__version__, machine=machine_key(),
+                  numpy=np.__version__, timestamp=time.strftime('%Y-%m-%dT%H:%M:%S%z'))
+    records = []
+    for name in names:
+        if name in IMPORTS:
+            record = run_import_case(name, repeat)
+            record.update(common)
+            records.append(record)
+            log(format_record(record))
+            continue
+        for size in sizes:
+            # a new spawned process per case keeps peak RSS and warm caches per case
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                record = pool.submit(run_case, name, int(size), repeat, str(root)).result()
+            record.update(common)
+            records.append(record)
+            log(format_record(record))
+    return records
+
+
+def format_record(record):
+    rss = record['peak_rss_mb']
+    rss = f"{rss:8.1f} MiB" if rss is not None else '       - MiB'
+    if record['benchmark'] in IMPORTS:
+        loaded = record.get('optional_modules')
+        note = f"  also imports {', '.join(loaded)}" if loaded else ''
+        return (f"{record['benchmark']:15s}  {record['time_s']:9.4f} s import  "
+                f"{record['process_s']:7.4f} s process  {rss}{note}")
+    rate = record['samples_per_s'] or 0.0
+    return f"{record['benchmark']:11s} n={record['size']:>9,d}  {record['time_s']:9.4f} s  {rate:12.4g} /s  {rss}"
+
+
+# --- history ----------------------------------------------------------------
+
+def load_history(path=None):
+    path = Path(path or history_path())
+    if not path.exists():
+        return []
+    with path.open() as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(records, path=None):
+    path = Path(path or history_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return path
+
+
+def compare(records, history, tolerance=TOLERANCE, window=WINDOW):
+    """Cases in ``records`` slower or larger than their recent history on the same machine.
+
+    The baseline for a (benchmark, size) case is the median of its last
+    ``window`` records in ``history``; a case regresses when its time or
+    peak RSS exceeds the baseline by more than ``tolerance``.
+    """
+    regressions = []
+    for record in records:
+        past = [h for h in history if h['benchmark'] == record['benchmark'] and h['size'] == record['size']
+                and h.get('machine') == record.get('machine')][-window:]
+        if not past:
+            continue
+        for key in ('time_s', 'peak_rss_mb'):
+            values = [h[key] for h in past if h.get(key) is not None]
+            if record.get(key) is None or not values:
+                continue
+            baseline = statistics.median(values)
+            if record[key] > baseline * (1.0 + tolerance):
+                regressions.append(dict(benchmark=record['benchmark'], size=record['size'], metric=key,
+                                        value=record[key], baseline=baseline, ratio=record[key] / baseline))
+    return regressions
@@ -0,0 +1,195 @@
+"""
+Content-addressed results cache for the G-star -> Drake pipeline.
+
+A run is identified by a key: the SHA-256 of its full parameter set (as
+canonical JSON), the digests of its input files (e.g. Data/reid_arms.csv),
+the seed and the package version.  Identical inputs give the same key, so a
+repeated run can return the stored outputs instead of resampling, and a
+downstream stage can ask for exactly the G-star result matching its declared
+parameters.
+
+Each entry is a directory ``<root>/<key>/`` with ``result.json`` (the result
+dict) and ``arrays.npz`` (sample arrays, density grids, ...).  Entries are
+written to a temporary directory and renamed into place, so readers never
+see a half-written entry.  Reading an entry touches it; when the cache grows
+past ``max_entries`` or ``max_bytes`` the least recently used entries go first.
+
+Runs without a seed are not reproducible and should not be cached.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from . import __version__
+
+
+RESULT_FILE = 'result.json'
+ARRAYS_FILE = 'arrays.npz'
+
+
+def _jsonable(obj):
+    if isinstance(obj, dict):
+        return {str(k): _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Path):
+        return str(obj)
+    return obj
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 hex digest of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _without(obj, ignore):
+    """``obj`` with the dict keys in ``ignore`` removed at every depth."""
+    if isinstance(obj, dict):
+        return {k: _without(v, ignore) for k, v in obj.items() if k not in ignore}
+    if isinstance(obj, list):
+        return [_without(v, ignore) for v in obj]
+    return obj
+
+
+def json_digest(path, ignore=()):
+    """SHA-256 of a JSON file's content without the keys in ``ignore`` (the bytes if it is not JSON)."""
+    try:
+        with open(path) as f:
+            obj = json.load(f)
+    except ValueError:
+        return file_digest(path)
+    text = json.dumps(_without(obj, ignore), sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def cache_key(params, input_files=(), seed=None):
+    """Key of a run: hash of parameters, input-file contents, seed and package version."""
+    payload = dict(
+        params=_jsonable(params),
+        inputs=sorted(file_digest(p) for p in input_files),
+        seed=_jsonable(seed),
+        version=__version__,
+    )
+    blob = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def write_json_if_changed(path, obj, indent=2, ignore=()):
+    """Write ``obj`` as JSON unless the file already holds exactly that text; returns True if written.
+
+    Keys in ``ignore`` (e.g. ``provenance``, which differs on every run) are
+    left out of the comparison, at any depth.
+    """
+    path = Path(path)
+    obj = _jsonable(obj)
+    text = json.dumps(obj, indent=indent)
+    if path.exists():
+        old = path.read_text()
+        if old == text:
+            return False
+        if ignore:
+            try:
+                if json.dumps(_without(json.loads(old), ignore)) == json.dumps(_without(obj, ignore)):
+                    return False
+            except ValueError:
+                pass
+    path.write_text(text)
+    return True
+
+
+class ResultsCache:
+    """Directory of content-addressed result entries with LRU / size eviction."""
+
+    def __init__(self, root, max_entries=None, max_bytes=None):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _entry(self, key):
+        return self.root / key
+
+    def __contains__(self, key):
+        return (self._entry(key) / RESULT_FILE).exists()
+
+    def get(self, key):
+        """``(result, arrays)`` stored under ``key``, or None on a miss."""
+        if key is None or key not in self:
+            return None
+        entry = self._entry(key)
+        with (entry / RESULT_FILE).open() as f:
+            result = json.load(f)
+        arrays = {}
+        if (entry / ARRAYS_FILE).exists():
+            with np.load(entry / ARRAYS_FILE) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        now = time.time()
+        os.utime(entry, (now, now))
+        return result, arrays
+
+    def put(self, key, result, arrays=None):
+        """Store ``result`` (JSON-able dict) and optional named arrays under ``key``."""
+        tmp = Path(tempfile.mkdtemp(prefix='.tmp-', dir=self.root))
+        try:
+            with (tmp / RESULT_FILE).open('w') as f:
+                json.dump(_jsonable(result), f, indent=2)
+            if arrays:
+                np.savez(tmp / ARRAYS_FILE, **arrays)
+            entry = self._entry(key)
+            if entry.exists():
+                shutil.rmtree(entry)
+            os.replace(tmp, entry)
+        finally:
+            if tmp.exists():
+                shutil.rmtree(tmp)
+        self.evict()
+        return key
+
+    def memoize(self, key, compute):
+        """Return the entry under ``key``, calling ``compute() -> (result, arrays)`` on a miss.
+
+        ``key=None`` (e.g. an unseeded run) always computes and stores nothing.
+        Returns ``(result, arrays, hit)``.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached + (True,)
+        result, arrays = compute()
+        if key is not None:
+            self.put(key, result, arrays)
+        return result, arrays, False
+
+    def entries(self):
+        """``(key, last_used, size_bytes)`` per entry, least recently used first."""
+        out = []
+        for entry in self.root.iterdir():
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            size = sum(p.stat().st_size for p in entry.iterdir())
+            out.append((entry.name, entry.stat().st_mtime, size))
+        return sorted(out, key=lambda e: e[1])
+
+    def evict(self):
+        """Drop least recently used entries until within max_entries / max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        while entries and ((self.max_entries is not None and len(entries) > self.max_entries)
+                           or (self.max_bytes is not None and total > self.max_bytes)):
+            key, _, size = entries.pop(0)
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
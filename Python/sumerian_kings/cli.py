@@ -0,0 +1,104 @@
+"""
+Command-line entry point for the batch pipeline.
+
+    sumerian-kings stages                      # the DAG and each stage's inputs / outputs
+    sumerian-kings status                      # which stages are stale
+    sumerian-kings run                         # everything that is stale
+    sumerian-kings run thresholds -j 4         # one target and its stale upstream stages
+    sumerian-kings run --set N_mc=1000000 --set seed=1 --force shell
+    sumerian-kings bench drake kings --sizes 1e5 1e6   # kernel benchmarks vs. stored history
+
+``--config file.json`` and ``--set key=value`` (JSON values) override
+``pipeline.DEFAULT_CONFIG``.
+"""
+
+import argparse
+import json
+import sys
+
+from . import __version__
+from .pipeline import DEFAULT_CONFIG, STAGES, Pipeline, dependencies
+
+
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def _config(args):
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config.update(json.load(f))
+    for item in args.set or ():
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise SystemExit(f"--set expects key=value, got {item!r}")
+        if key not in DEFAULT_CONFIG:
+            raise SystemExit(f"Unknown config key {key!r}")
+        config[key] = _parse_value(value)
+    return config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='sumerian-kings', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
+    parser.add_argument('--root', help='project directory holding Data/ (default: this checkout or the cwd)')
+    parser.add_argument('--results', help='results directory (default: <root>/Results)')
+    parser.add_argument('--config', help='JSON file of config overrides')
+    parser.add_argument('--set', action='append', metavar='KEY=VALUE', help='override one config value')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('stages', help='list stages, their dependencies and outputs')
+    sub.add_parser('status', help='show which stages are stale')
+    run = sub.add_parser('run', help='run stale stages')
+    run.add_argument('targets', nargs='*', help='stages to bring up to date (default: all)')
+    run.add_argument('-j', '--jobs', type=int, default=1, help='stages to run concurrently')
+    run.add_argument('--force', nargs='*', default=None, metavar='STAGE',
+                     help='rerun these stages (all targets if none given) even if up to date')
+    bench = sub.add_parser('bench', help='benchmark the Monte Carlo kernels and check for regressions')
+    bench.add_argument('benchmarks', nargs='*', help='benchmarks to run (default: all)')
+    bench.add_argument('--sizes', nargs='+', type=float, help='problem sizes (default: 1e4 1e5 1e6 1e7)')
+    bench.add_argument('--repeat', type=int, help='timed calls per case; the best is recorded')
+    bench.add_argument('--tolerance', type=float, help='fractional slow-down reported as a regression')
+    bench.add_argument('--no-save', action='store_true', help='do not append the results to the history')
+    args = parser.parse_args(argv)
+    if args.command == 'bench':
+        return _bench(args)
+
+    pipeline = Pipeline(_config(args), root=args.root, results=args.results)
+    if args.command == 'stages':
+        for name, stage in STAGES.items():
+            deps = ', '.join(dependencies(name)) or '-'
+            print(f"{name:12s} after: {deps:24s} writes: {', '.join(stage.outputs)}")
+    elif args.command == 'status':
+        for name, status in pipeline.status().items():
+            print(f"{name:12s} {status}")
+    else:
+        force = args.force
+        if force is not None and not force:
+            force = args.targets or list(STAGES)
+        pipeline.run(args.targets or None, force=set(force or ()), jobs=args.jobs)
+    return 0
+
+
+def _bench(args):
+    from . import bench, paths
+
+    root = args.root or paths.PROJECT_ROOT
+    history_path = bench.history_path(args.results or paths.results_dir(root))
+    records = bench.run_benchmarks(args.benchmarks or None, sizes=args.sizes or bench.SIZES,
+                                   repeat=args.repeat or bench.REPEAT, root=root)
+    regressions = bench.compare(records, bench.load_history(history_path),
+                                tolerance=args.tolerance if args.tolerance is not None else bench.TOLERANCE)
+    if not args.no_save:
+        print(f"Appended {len(records)} records to {bench.append_history(records, history_path)}")
+    for r in regressions:
+        print(f"REGRESSION {r['benchmark']} n={r['size']:,d} {r['metric']}: "
+              f"{r['value']:.4g} vs baseline {r['baseline']:.4g} ({r['ratio']:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
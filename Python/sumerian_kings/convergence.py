@@ -0,0 +1,197 @@
+"""
+Adaptive convergence control for the Monte Carlo runs.
+
+Instead of a fixed sample count (N_mc, n_samples, N_samples), draw batches
+until every tracked estimate reaches the requested precision:
+
+* ``RunningStats`` keeps an online (Welford / Chan) mean and variance,
+  element-wise over any trailing shape and ignoring NaNs, so ragged per-king
+  samples can be tracked as one (n, n_kings) array;
+* optional ``QuantileSketch``es give streaming quantiles and their
+  order-statistic confidence intervals;
+* ``run_until_converged`` drives a batch sampler and stops once the relative
+  standard error of every mean is below ``rel_tol`` and every tracked
+  quantile's relative confidence half-width is below ``quantile_tol``.
+
+The returned summary records the achieved errors, samples used and whether the
+targets were met, ready to be stored under ``'convergence'`` in a results JSON.
+"""
+
+import numpy as np
+
+from . import drake, kings
+from .sketch import QuantileSketch
+from .shell import compute_sigma0, iter_shell_chunks, shell_volume
+from .spiral_arms import min_arm_separation
+
+
+class RunningStats:
+    """Online mean / variance (NaN-aware, element-wise over trailing dims)."""
+
+    def __init__(self, shape=()):
+        self.count = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        valid = ~np.isnan(x)
+        n_b = valid.sum(axis=0)
+        safe = np.where(valid, x, 0.0)
+        mean_b = safe.sum(axis=0) / np.maximum(n_b, 1)
+        m2_b = (np.where(valid, x - mean_b, 0.0) ** 2).sum(axis=0)
+        self._combine(n_b, mean_b, m2_b)
+        return self
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2)
+        return self
+
+    def _combine(self, n_b, mean_b, m2_b):
+        # Chan et al. pairwise update
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        frac = np.divide(n_b, n, out=np.zeros_like(n, dtype=float), where=n > 0)
+        self.mean = self.mean + delta * frac
+        self.m2 = self.m2 + m2_b + delta**2 * self.count * frac
+        self.count = n
+
+    @property
+    def variance(self):
+        return np.divide(self.m2, self.count - 1, out=np.full_like(self.m2, np.nan), where=self.count > 1)
+
+    @property
+    def sem(self):
+        return np.sqrt(self.variance / np.maximum(self.count, 1))
+
+    @property
+    def rel_sem(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.abs(self.sem / self.mean)
+
+
+class Metric:
+    """One tracked quantity: running mean and optional streaming quantiles."""
+
+    def __init__(self, shape=(), quantiles=()):
+        self.stats = RunningStats(shape)
+        self.quantiles = tuple(quantiles)
+        # one sketch per element of the (possibly per-king) metric
+        n_sketches = int(np.prod(shape)) if self.quantiles else 0
+        self.sketches = [QuantileSketch() for _ in range(n_sketches)]
+
+    def update(self, x):
+        self.stats.update(x)
+        if self.sketches:
+            columns = np.asarray(x, dtype=float).reshape(len(x), -1)
+            for sk, col in zip(self.sketches, columns.T):
+                sk.update(col)
+
+    def quantile_rel_error(self):
+        if not self.sketches:
+            return 0.0
+        q = np.asarray(self.quantiles)
+        errors = []
+        for sk in self.sketches:
+            if sk.n == 0:
+                return np.inf
+            lo, hi = sk.interval(q)
+            mid = sk.quantile(q)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                errors.append(np.where(mid == 0, 0.0, 0.5 * (hi - lo) / np.abs(mid)))
+        return float(np.nanmax(errors))
+
+    def summary(self):
+        out = dict(mean=self.stats.mean.tolist(), sem=self.stats.sem.tolist(),
+                   rel_sem=self.stats.rel_sem.tolist(), count=self.stats.count.tolist())
+        if self.sketches:
+            shape = self.stats.mean.shape + (len(self.quantiles),)
+            out['quantile_levels'] = list(self.quantiles)
+            out['quantiles'] = np.reshape([sk.quantile(self.quantiles) for sk in self.sketches], shape).tolist()
+            out['quantile_rel_error'] = self.quantile_rel_error()
+        return out
+
+
+def run_until_converged(sample_batch, metrics, rel_tol=None, quantile_tol=None, batch_size=100_000,
+                        min_samples=0, max_samples=100_000_000):
+    """Draw batches until all ``metrics`` meet the tolerances (or max_samples is reached).
+
+    ``sample_batch(n, i)`` returns ``{name: array}`` with the per-sample values
+    of each metric for batch ``i`` (leading axis = samples); ``metrics`` maps
+    the same names to ``Metric`` objects.  Returns the 'convergence' summary.
+    """
+    n_samples = 0
+    n_batches = 0
+    converged = False
+    while n_samples < max_samples:
+        n = min(batch_size, max_samples - n_samples)
+        for name, values in sample_batch(n, n_batches).items():
+            metrics[name].update(values)
+        n_samples += n
+        n_batches += 1
+        if n_samples < min_samples:
+            continue
+        ok = True
+        for m in metrics.values():
+            if rel_tol is not None and not np.all(m.stats.rel_sem <= rel_tol):
+                ok = False
+            if quantile_tol is not None and m.quantile_rel_error() > quantile_tol:
+                ok = False
+        if ok:
+            converged = True
+            break
+    return dict(
+        converged=converged, n_samples=n_samples, n_batches=n_batches, batch_size=batch_size,
+        rel_tol=rel_tol, quantile_tol=quantile_tol,
+        metrics={name: m.summary() for name, m in metrics.items()},
+    )
+
+
+def converge_shell_model(r1, r2, arm_params, R0_pc, Rd, hz, Rmax, N_total, arm_half_width, rel_tol=0.01,
+                         seed=None, batch_size=100_000, max_samples=100_000_000):
+    """Run the uniform shell sampler until N_expected_shell / N_expected_arms reach ``rel_tol``."""
+    V_shell = shell_volume(r1, r2)
+    sigma0 = compute_sigma0(N_total, Rd, Rmax)
+    chunks = iter_shell_chunks(max_samples, r1, r2, R0_pc, sigma0, Rd, hz, seed=seed, chunk_size=batch_size)
+
+    def sample_batch(n, i):
+        chunk = next(chunks)
+        in_arm = min_arm_separation(chunk['R_gc'], chunk['phi_gc'], arm_params) < arm_half_width
+        N_shell = chunk['rho'] * V_shell
+        return dict(N_expected_shell=N_shell, N_expected_arms=N_shell * in_arm)
+
+    metrics = dict(N_expected_shell=Metric(), N_expected_arms=Metric())
+    return run_until_converged(sample_batch, metrics, rel_tol=rel_tol, batch_size=batch_size,
+                               max_samples=max_samples)
+
+
+def converge_drake(N_stars, rel_tol=0.01, quantile_tol=None, quantiles=(0.05, 0.5, 0.95), seed=None,
+                   priors=None, batch_size=100_000, max_samples=100_000_000, **drake_params):
+    """Run the Drake prior Monte Carlo until mean (and quantiles) of P(>=1), N_civ converge."""
+    priors = priors or drake.DEFAULT_PRIORS
+    streams = drake.prior_streams(seed, priors)
+
+    def sample_batch(n, i):
+        p = drake.per_star_probability(**drake.sample_priors(n, streams, priors), **drake_params)
+        return dict(p_any=drake.prob_at_least_one(p, N_stars), expected_n_civ=N_stars * p)
+
+    metrics = {name: Metric(quantiles=quantiles if quantile_tol is not None else ())
+               for name in ('p_any', 'expected_n_civ')}
+    return run_until_converged(sample_batch, metrics, rel_tol=rel_tol, quantile_tol=quantile_tol,
+                               batch_size=batch_size, max_samples=max_samples)
+
+
+def converge_kings(reigns, rel_tol=0.001, seed=None, lower_age=kings.LOWER_AGE, upper_age=kings.UPPER_AGE,
+                   quantiles=(0.05, 0.5, 0.95), batch_size=100_000, max_samples=10_000_000):
+    """Draw speed samples until each king's b_mean reaches ``rel_tol``; also sketches b percentiles."""
+    reigns = np.asarray(reigns, dtype=float)
+    rng = np.random.default_rng(seed)
+
+    def sample_batch(n, i):
+        return dict(b=kings.sample_speeds(reigns, n, rng, lower_age, upper_age))
+
+    metrics = dict(b=Metric(shape=reigns.shape, quantiles=quantiles))
+    result = run_until_converged(sample_batch, metrics, rel_tol=rel_tol, batch_size=batch_size,
+                                 max_samples=max_samples)
+    result['metrics']['b_mean'] = result['metrics'].pop('b')
+    return result
@@ -0,0 +1,284 @@
+"""
+Drake-equation Monte Carlo for a population of N_stars.
+
+Per-star probability of a detectable civilization:
+
+    p = fp * ne * f_l * f_i * f_c * (L / t_star)
+
+and the probability of at least one among N_stars independent stars,
+computed stably as P(>=1) = 1 - exp(N_stars * log1p(-p)).
+
+Priors are described as ``(kind, low, high)`` tuples with kind 'uniform' or
+'loguniform', matching the ranges in g_drake_estimate.ipynb.  All sampling
+goes through explicit ``numpy.random.Generator`` streams, never the global
+``np.random`` state.
+"""
+
+import math
+
+import numpy as np
+
+from .labelled import LabelledGrid
+from .sketch import QuantileSketch
+
+
+T_STAR_G = 1.0e10  # G-type main-sequence lifetime (years)
+FP = 1.0           # fraction of stars with planets
+NE = 0.1           # potentially habitable planets per star
+
+DEFAULT_PRIORS = {
+    'f_l': ('loguniform', 1e-6, 1.0),
+    'f_i': ('loguniform', 1e-6, 1.0),
+    'f_c': ('uniform', 0.01, 1.0),
+    'L': ('loguniform', 1e2, 1e8),
+}
+
+# Prior sets compared in the sensitivity cell of g_drake_estimate.ipynb
+SENSITIVITY_SCENARIOS = {
+    'Baseline': DEFAULT_PRIORS,
+    'Optimistic': {
+        'f_l': ('uniform', 1e-2, 1.0),
+        'f_i': ('uniform', 1e-2, 1.0),
+        'f_c': ('uniform', 0.1, 1.0),
+        'L': ('loguniform', 1e6, 1e8),
+    },
+    'Pessimistic': {
+        'f_l': ('loguniform', 1e-6, 1e-4),
+        'f_i': ('loguniform', 1e-6, 1e-4),
+        'f_c': ('uniform', 0.01, 0.1),
+        'L': ('loguniform', 1e2, 1e4),
+    },
+}
+
+GRID_FACTORS = ('fp', 'ne', 'f_l', 'f_i', 'f_c', 'L')
+
+QUANTILES = (0.001, 0.01, 0.05, 0.16, 0.5, 0.84, 0.95, 0.99, 0.999)
+
+# 0.05 dex bins for log10 of p, P(>=1) and expected N_civ (values clipped at 1e-30)
+LOG10_EDGES = np.linspace(-30.0, 10.0, 801)
+EPS = 1e-30
+CHUNK_SIZE = 1 << 18
+
+
+def loguniform(rng, low, high, size=None):
+    """Sample from a log-uniform distribution on [low, high]."""
+    return np.exp(rng.uniform(math.log(low), math.log(high), size=size))
+
+
+def sample_prior(rng, spec, size=None):
+    """Draw ``size`` values from a ``(kind, low, high)`` prior."""
+    kind, low, high = spec
+    if kind == 'loguniform':
+        return loguniform(rng, low, high, size=size)
+    if kind == 'uniform':
+        return rng.uniform(low, high, size=size)
+    raise ValueError(f"Unknown prior kind: {kind!r}")
+
+
+def prior_ppf(u, spec):
+    """Inverse CDF of a ``(kind, low, high)`` prior evaluated at uniforms ``u``."""
+    kind, low, high = spec
+    if kind == 'loguniform':
+        return np.exp(math.log(low) + u * (math.log(high) - math.log(low)))
+    if kind == 'uniform':
+        return low + u * (high - low)
+    raise ValueError(f"Unknown prior kind: {kind!r}")
+
+
+def quantile_summary(x, quantiles=QUANTILES):
+    """Exact quantiles 0.1%, 1%, 5%, 16%, 50%, 84%, 95%, 99%, 99.9% of the in-memory array ``x``.
+
+    Streaming runs, where the full array is never held, take their quantiles
+    from ``DrakeAccumulator``'s sketches instead.
+    """
+    return np.quantile(x, quantiles)
+
+
+def prior_streams(seed=None, priors=DEFAULT_PRIORS):
+    """One Generator per prior factor, spawned from ``seed``.
+
+    Giving every factor its own stream makes chunked sampling produce the same
+    draws as a single in-memory call, whatever the chunk size.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return dict(zip(priors, (np.random.default_rng(s) for s in seed.spawn(len(priors)))))
+
+
+def sample_priors(n, streams, priors=DEFAULT_PRIORS):
+    """Draw ``n`` samples of every factor in ``priors`` from ``prior_streams``."""
+    return {name: sample_prior(streams[name], spec, size=n) for name, spec in priors.items()}
+
+
+def per_star_probability(f_l, f_i, f_c, L, fp=FP, ne=NE, t_star=T_STAR_G):
+    """Per-star probability p, clipped just below 1 so log1p(-p) stays finite."""
+    p = fp * ne * f_l * f_i * f_c * (L / t_star)
+    return np.clip(p, 0.0, 1.0 - 1e-16)
+
+
+def prob_at_least_one(p, N_stars):
+    """P(at least one civilization) among N_stars stars with per-star probability p."""
+    return -np.expm1(N_stars * np.log1p(-p))
+
+
+class DrakeAccumulator:
+    """Mergeable sums, log10 histograms and quantile sketches of p, P(>=1) and expected N_civ."""
+
+    keys = ('per_star_p', 'p_any', 'expected_n_civ')
+
+    def __init__(self, N_stars, edges=LOG10_EDGES):
+        self.N_stars = N_stars
+        self.edges = edges
+        self.n = 0
+        self.sums = dict.fromkeys(self.keys, 0.0)
+        self.hists = {k: np.zeros(len(edges) - 1, dtype=np.int64) for k in self.keys}
+        self.sketches = {k: QuantileSketch() for k in self.keys}
+
+    def add(self, p):
+        values = dict(per_star_p=p, p_any=prob_at_least_one(p, self.N_stars),
+                      expected_n_civ=self.N_stars * p)
+        self.n += p.size
+        for k, x in values.items():
+            self.sums[k] += float(np.sum(x))
+            self.hists[k] += np.histogram(np.log10(np.clip(x, EPS, None)), bins=self.edges)[0]
+            self.sketches[k].update(x)
+        return values
+
+    def merge(self, other):
+        self.n += other.n
+        for k in self.keys:
+            self.sums[k] += other.sums[k]
+            self.hists[k] += other.hists[k]
+            self.sketches[k].merge(other.sketches[k])
+        return self
+
+    def result(self, quantiles=QUANTILES, include_sketches=False):
+        """Summary in the layout of g_drake_results_notebook.json (quantiles from the sketches)."""
+        out = {'N_stars_used': float(self.N_stars), 'n_samples': self.n}
+        for k in self.keys:
+            sk = self.sketches[k]
+            out[f'{k}_quantiles'] = sk.quantile(quantiles).tolist()
+            out[f'{k}_mean'] = self.sums[k] / self.n
+            out[f'{k}_median'] = float(sk.quantile(0.5))
+        if include_sketches:
+            out['sketches'] = {k: sk.to_dict() for k, sk in self.sketches.items()}
+        return out
+
+
+def run_drake(n_samples, N_stars, seed=None, priors=DEFAULT_PRIORS, fp=FP, ne=NE, t_star=T_STAR_G,
+              chunk_size=CHUNK_SIZE):
+    """Sample ``n_samples`` prior draws in chunks and fold them into a DrakeAccumulator."""
+    streams = prior_streams(seed, priors)
+    acc = DrakeAccumulator(N_stars)
+    for start in range(0, n_samples, chunk_size):
+        draws = sample_priors(min(chunk_size, n_samples - start), streams, priors)
+        acc.add(per_star_probability(fp=fp, ne=ne, t_star=t_star, **draws))
+    return acc
+
+
+def _scenario_values(u, specs):
+    """Map base uniforms ``u`` (n,) through each scenario's prior -> (n_scenarios, n)."""
+    kinds = np.array([spec[0] for spec in specs])
+    bad = set(kinds) - {'uniform', 'loguniform'}
+    if bad:
+        raise ValueError(f"Unknown prior kind: {bad.pop()!r}")
+    log = (kinds == 'loguniform')[:, None]
+    low = np.array([spec[1] for spec in specs], dtype=float)[:, None]
+    high = np.array([spec[2] for spec in specs], dtype=float)[:, None]
+    # log-uniform is uniform in log space, so both kinds are one affine map
+    lo = np.where(log, np.log(low), low)
+    hi = np.where(log, np.log(high), high)
+    x = lo + u[None, :] * (hi - lo)
+    return np.where(log, np.exp(x), x)
+
+
+def evaluate_scenarios(scenarios, n_samples, N_stars, seed=None, fp=FP, ne=NE, t_star=T_STAR_G,
+                       quantiles=QUANTILES):
+    """Evaluate many prior scenarios in one pass with common random numbers.
+
+    One set of base uniforms per factor is drawn and pushed through every
+    scenario's inverse CDF, so all scenarios see the same underlying draws
+    (scenario differences carry far less Monte Carlo noise than independent
+    runs) and the whole set is a single (n_scenarios, n_samples) evaluation.
+    Scenarios may give different factor sets: a factor missing from a
+    scenario takes its ``DEFAULT_PRIORS`` spec.
+
+    Returns ``{name: summary}`` with the keys written to g_drake_sensitivity.json.
+    """
+    names = list(scenarios)
+    # union of the factors, in first-seen order (the order the streams are spawned in)
+    factors = list(dict.fromkeys(f for spec in scenarios.values() for f in spec))
+    scenarios = {name: {**DEFAULT_PRIORS, **spec} for name, spec in scenarios.items()}
+    for name, spec in scenarios.items():
+        missing = [f for f in factors if f not in spec]
+        if missing:
+            raise KeyError(f"Scenario {name!r} has no prior for {missing} and there is no default for it")
+    streams = prior_streams(seed, dict.fromkeys(factors))
+    p = np.full((len(names), n_samples), fp * ne / t_star)
+    for factor in factors:
+        u = streams[factor].random(n_samples)
+        p *= _scenario_values(u, [scenarios[name][factor] for name in names])
+    np.clip(p, 0.0, 1.0 - 1e-16, out=p)
+    p_any = prob_at_least_one(p, N_stars)
+
+    # p_any and N*p are increasing in p, so the order statistics that bracket
+    # each quantile of p bracket the same quantiles of p_any and N*p.
+    pos = np.asarray(quantiles) * (n_samples - 1)
+    lo_idx = np.floor(pos).astype(np.int64)
+    hi_idx = np.minimum(lo_idx + 1, n_samples - 1)
+    frac = pos - lo_idx
+    part = np.partition(p, np.unique(np.concatenate([lo_idx, hi_idx])), axis=1)
+
+    def interp(values):
+        return values[:, lo_idx] + frac * (values[:, hi_idx] - values[:, lo_idx])
+
+    p_q = interp(part)
+    p_any_q = interp(prob_at_least_one(part, N_stars))
+    n_civ_q = interp(N_stars * part)
+    p_mean = p.mean(axis=1)
+    p_any_mean = p_any.mean(axis=1)
+
+    return {
+        name: {
+            'per_star_p_quantiles': p_q[k].tolist(),
+            'p_any_quantiles': p_any_q[k].tolist(),
+            'expected_n_civ_quantiles': n_civ_q[k].tolist(),
+            'per_star_p_mean': float(p_mean[k]),
+            'p_any_mean': float(p_any_mean[k]),
+            'expected_n_civ_mean': float(N_stars * p_mean[k]),
+        }
+        for k, name in enumerate(names)
+    }
+
+
+def evaluate_grid(N_stars, t_star=T_STAR_G, **factors):
+    """Deterministic P(>=1) and expected N_civ over a grid of Drake factors.
+
+    Each keyword in GRID_FACTORS (fp, ne, f_l, f_i, f_c, L) is either a scalar
+    (held fixed, default FP/NE for fp/ne) or a 1-D array that becomes a grid
+    axis, in keyword order.  The whole tensor is one broadcast expression:
+
+        grid = evaluate_grid(N_stars, L=[1e3, 1e6, 1e8], f_i=fi_vals, f_l=fl_vals, f_c=0.1)
+        grid['p_any'].shape  # (3, len(fi_vals), len(fl_vals))
+    """
+    unknown = set(factors) - set(GRID_FACTORS)
+    if unknown:
+        raise TypeError(f"Unknown Drake factor(s): {sorted(unknown)}")
+    factors.setdefault('fp', FP)
+    factors.setdefault('ne', NE)
+    missing = set(GRID_FACTORS) - set(factors)
+    if missing:
+        raise TypeError(f"Missing Drake factor(s): {sorted(missing)}")
+
+    coords = {name: np.asarray(v, dtype=float) for name, v in factors.items() if np.ndim(v) > 0}
+    fixed = {name: float(v) for name, v in factors.items() if np.ndim(v) == 0}
+    p = np.full(tuple(len(v) for v in coords.values()), math.prod(fixed.values()) / t_star)
+    for axis, values in enumerate(coords.values()):
+        shape = [1] * p.ndim
+        shape[axis] = -1
+        p = p * values.reshape(shape)
+    np.clip(p, 0.0, 1.0 - 1e-16, out=p)
+
+    data_vars = dict(p_any=prob_at_least_one(p, N_stars), expected_n_civ=N_stars * p)
+    attrs = dict(fixed, t_star=t_star, N_stars_used=float(N_stars))
+    return LabelledGrid(coords, data_vars, attrs)
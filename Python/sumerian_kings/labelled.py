@@ -0,0 +1,72 @@
+"""
+Minimal labelled n-d grid (an xarray.Dataset-like container without the dependency).
+
+A ``LabelledGrid`` holds named 1-D coordinate arrays, one per dimension in
+order, and any number of data variables that all share that shape.  It is the
+exchange format between the grid evaluators, the CSV/JSON writers and the
+plotting cells.
+"""
+
+import numpy as np
+
+
+class LabelledGrid:
+    """Data variables on a shared grid of named, ordered coordinates."""
+
+    def __init__(self, coords, data_vars, attrs=None):
+        self.coords = {dim: np.asarray(values) for dim, values in coords.items()}
+        self.data_vars = dict(data_vars)
+        self.attrs = dict(attrs or {})
+        shape = self.shape
+        for name, values in self.data_vars.items():
+            if values.shape != shape:
+                raise ValueError(f"{name!r} has shape {values.shape}, expected {shape}")
+
+    @property
+    def dims(self):
+        return tuple(self.coords)
+
+    @property
+    def shape(self):
+        return tuple(len(v) for v in self.coords.values())
+
+    def __getitem__(self, name):
+        return self.data_vars[name]
+
+    def __repr__(self):
+        dims = ', '.join(f'{d}: {n}' for d, n in zip(self.dims, self.shape))
+        return f"<LabelledGrid ({dims}) vars={list(self.data_vars)}>"
+
+    def index(self, dim, value):
+        """Position of ``value`` along ``dim`` (nearest coordinate)."""
+        return int(np.argmin(np.abs(self.coords[dim] - value)))
+
+    def isel(self, **indexers):
+        """Select integer positions along dimensions; selected dims are dropped."""
+        key = tuple(indexers.get(dim, slice(None)) for dim in self.dims)
+        coords = {d: v for d, v in self.coords.items() if d not in indexers}
+        data_vars = {name: values[key] for name, values in self.data_vars.items()}
+        attrs = dict(self.attrs, **{d: self.coords[d][i].item() for d, i in indexers.items()})
+        return LabelledGrid(coords, data_vars, attrs)
+
+    def sel(self, **indexers):
+        """Select by coordinate value (nearest match); selected dims are dropped."""
+        return self.isel(**{dim: self.index(dim, value) for dim, value in indexers.items()})
+
+    def columns(self):
+        """Long-format columns: one flattened array per coordinate and data variable."""
+        mesh = np.meshgrid(*self.coords.values(), indexing='ij')
+        cols = {dim: m.ravel() for dim, m in zip(self.dims, mesh)}
+        cols.update((name, values.ravel()) for name, values in self.data_vars.items())
+        return cols
+
+    def to_csv(self, path, rename=None):
+        """Write one row per grid cell; ``rename`` maps dim/variable names to column names."""
+        cols = self.columns()
+        header = ','.join((rename or {}).get(name, name) for name in cols)
+        np.savetxt(path, np.column_stack(list(cols.values())), delimiter=',', header=header,
+                   comments='', fmt='%.17g')
+
+    def metadata(self):
+        """JSON-serialisable coordinates and attributes (without the data itself)."""
+        return dict({f'{d}_vals': v.tolist() for d, v in self.coords.items()}, **self.attrs)
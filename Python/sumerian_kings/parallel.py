@@ -0,0 +1,83 @@
+"""
+Process-pool driver for the Monte Carlo engines.
+
+``run_parallel`` splits ``n_samples`` across ``n_workers`` processes.  Worker
+``i`` gets the i-th child of ``SeedSequence(seed).spawn(n_workers)``, so its
+stream is independent of every other worker and of scheduling.  Each worker
+returns an accumulator (``ShellAccumulator``, ``DrakeAccumulator``,
+``VoyageAccumulator``) and the partial results are merged in worker order -
+sums and histograms add exactly, so a given (seed, n_workers) pair always
+reproduces the same result, and ``n_workers=1`` runs in-process with the same
+answer as a 1-worker pool.
+
+On Windows workers are started with 'spawn', so call these from a notebook
+cell or under ``if __name__ == '__main__':`` in scripts.
+"""
+
+import os
+
+import numpy as np
+
+from .drake import run_drake
+from .shell import run_shell_model
+from .voyage import run_voyages
+
+
+def split_counts(n_samples, n_workers):
+    """Split ``n_samples`` into ``n_workers`` near-equal integer counts."""
+    base, extra = divmod(n_samples, n_workers)
+    return [base + (i < extra) for i in range(n_workers)]
+
+
+def run_parallel(task, n_samples, n_workers=None, seed=None, **kwargs):
+    """Run ``task(n_i, seed_i, **kwargs)`` on each worker and merge the results.
+
+    ``task`` must be a picklable module-level function returning an object
+    with a ``merge(other)`` method.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    counts = split_counts(n_samples, n_workers)
+    children = seed.spawn(n_workers)
+
+    if n_workers == 1:
+        partials = [task(counts[0], children[0], **kwargs)]
+    else:
+        # imported here so numeric entry points that never start a pool stay light
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(task, n, child, **kwargs) for n, child in zip(counts, children)]
+            partials = [f.result() for f in futures]
+
+    merged = partials[0]
+    for part in partials[1:]:
+        merged.merge(part)
+    return merged
+
+
+def _shell_task(n_samples, seed, **params):
+    return run_shell_model(n_samples, seed=seed, **params)
+
+
+def _drake_task(n_samples, seed, **params):
+    return run_drake(n_samples, seed=seed, **params)
+
+
+def _voyage_task(n_walkers, seed, **params):
+    return run_voyages(n_walkers, seed=seed, **params)
+
+
+def parallel_shell_model(N_mc, n_workers=None, seed=None, **params):
+    """``run_shell_model`` across a process pool; ``params`` as for run_shell_model."""
+    return run_parallel(_shell_task, N_mc, n_workers=n_workers, seed=seed, **params)
+
+
+def parallel_drake(n_samples, N_stars, n_workers=None, seed=None, **params):
+    """``run_drake`` across a process pool; ``params`` as for run_drake."""
+    return run_parallel(_drake_task, n_samples, n_workers=n_workers, seed=seed, N_stars=N_stars, **params)
+
+
+def parallel_voyages(n_walkers, reigns, n_workers=None, seed=None, **params):
+    """``run_voyages`` across a process pool; ``params`` as for run_voyages."""
+    return run_parallel(_voyage_task, n_walkers, n_workers=n_workers, seed=seed, reigns=reigns, **params)
@@ -0,0 +1,49 @@
+"""
+One results layout for the notebooks and the batch pipeline.
+
+G-star outputs live in ``Results/``, Drake outputs in ``Results/Drake/`` and
+the king-speed outputs in ``Results/Kings/``, always relative to the project
+root rather than the current working directory.  ``OUTPUTS`` names every file
+a pipeline stage writes so stages and notebooks refer to the same paths.
+"""
+
+from pathlib import Path
+
+
+# a source checkout (Python/sumerian_kings/) sits two levels below the project root;
+# an installed package falls back to the working directory
+_SOURCE_ROOT = Path(__file__).resolve().parents[2]
+PROJECT_ROOT = _SOURCE_ROOT if (_SOURCE_ROOT / 'Data').is_dir() else Path.cwd()
+
+OUTPUTS = {
+    'g_star_results': 'g_star_results.json',
+    'g_star_samples': 'g_star_samples',
+    'g_star_density_pyramid': 'g_star_density_pyramid',
+    'g_star_radial_profile': 'g_star_radial_profile',
+    'g_star_spatial_index': 'g_star_spatial_index',
+    'g_drake_results': 'Drake/g_drake_results.json',
+    'g_drake_sensitivity_grid': 'Drake/g_drake_sensitivity_grid',
+    'g_drake_thresholds': 'Drake/g_drake_thresholds.csv',
+    'g_drake_threshold_summary': 'Drake/g_drake_threshold_summary.json',
+    'g_drake_threshold_table': 'Drake/g_drake_threshold_table.json',
+    'kings_speeds': 'Kings/kings_speeds',
+    'kings_voyage': 'Kings/kings_voyage.json',
+    'figures': 'figures',
+}
+
+
+def data_dir(root=None):
+    return Path(root or PROJECT_ROOT) / 'Data'
+
+
+def results_dir(root=None):
+    return Path(root or PROJECT_ROOT) / 'Results'
+
+
+def drake_dir(root=None):
+    return results_dir(root) / 'Drake'
+
+
+def output_path(name, results=None):
+    """Path of the named output under ``results`` (default: <project>/Results)."""
+    return Path(results or results_dir()) / OUTPUTS[name]
@@ -0,0 +1,590 @@
+"""
+Batch pipeline: the notebook computations as a DAG of stages.
+
+    shell -> density ------------------------------+
+      +--> spatial_index                           v
+      +--> drake                                figures
+      +--> sensitivity -> thresholds ----------->  ^
+    kings ------------------------------------------+
+    voyage -----------------------------------------+
+    radial_profile ---------------------------------+
+
+Each ``Stage`` declares the config keys it depends on, the data files and
+upstream outputs it reads, and the outputs it writes (names from
+``paths.OUTPUTS``).  Before a stage runs, its fingerprint (a ``cache_key`` of
+its config values, the digests of its inputs and the package version) is
+compared with the one recorded after its last successful run in
+``Results/.pipeline/state.json``; a stage whose fingerprint is unchanged and
+whose outputs exist is skipped.  Because upstream outputs are part of the
+fingerprint, a rerun that changes them makes the downstream stages stale.
+Stages whose inputs are ready run concurrently in worker processes.
+"""
+
+import csv
+import hashlib
+import json
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from . import paths
+from .cache import _jsonable, cache_key, file_digest, json_digest
+from .telemetry import Telemetry
+
+
+DEFAULT_CONFIG = {
+    # shell and disk (g_star_spiral_model.ipynb)
+    'r1_ly': 16408.70211,
+    'r2_ly': 16428.70211,
+    'R0_pc': 8122.0,
+    'Rd': 2600.0,
+    'hz': 300.0,
+    'Rmax': 15000.0,
+    'arm_half_width': 300.0,
+    'N_total_G': 2.0e10,
+    'arm_csv': 'reid_arms.csv',
+    'n_arms': 4,
+    'pitch_deg': 12.0,
+    'N_mc': 200000,
+    'seed': None,
+    'density_nbins': 1600,
+    'density_levels': 5,
+    # radial profile: expected counts in profile_shells thin shells between these radii
+    'profile_r_min_ly': 0.0,
+    'profile_r_max_ly': 20000.0,
+    'profile_shells': 400,
+    'profile_samples_per_shell': 5000,
+    # Drake (g_drake_estimate.ipynb)
+    'drake_samples': 1000000,
+    'fp': 1.0,
+    'ne': 0.1,
+    't_star': 1.0e10,
+    'fc_fixed': 0.1,
+    'L_values': [1e3, 1e6, 1e8],
+    'grid_points': 40,
+    'thresholds': [0.01, 0.1, 0.5],
+    'area_fraction_targets': [0.001, 0.01, 0.1, 0.5],
+    # kings (sumerian-kings-monte-carlo-model.ipynb)
+    'kings_csv': 'Kish Kings 60 Units.csv',
+    'kings_samples': 100000,
+    'lower_age': 10,
+    'upper_age': 80,
+    # random-walk voyages; shells (20 ly, as r1_ly..r2_ly) start at these displacement quantiles
+    'voyage_walkers': 10000000,
+    'voyage_shell_quantiles': [0.05, 0.5, 0.95],
+    'voyage_shell_samples': 20000,
+    # figures
+    'figure_bins': 200,
+    'dpi': 150,
+}
+
+STATE_FILE = Path('.pipeline') / 'state.json'
+
+
+class Stage:
+    """One pipeline step: ``func(cfg, results, root, tel)`` writes ``outputs``.
+
+    ``tel`` is the stage's ``telemetry.Telemetry``; stages time their steps
+    with it and write ``tel.provenance()`` into the results they produce.
+    """
+
+    def __init__(self, name, func, params=(), data=(), inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.params = tuple(params)
+        self.data = tuple(data)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+
+
+def _content_digest(path):
+    # provenance (timestamps, timings) changes on every run; it is not part of an output's content
+    if path.suffix == '.json':
+        return json_digest(path, ignore=('provenance',))
+    return file_digest(path)
+
+
+def path_digest(path):
+    """SHA-256 of a file, or of every file (names and contents) under a directory.
+
+    JSON files (result JSONs, store ``meta.json``) are hashed without their
+    ``provenance`` blocks, so rerunning a stage that reproduces the same
+    results leaves its downstream stages up to date.
+    """
+    path = Path(path)
+    if path.is_file():
+        return _content_digest(path)
+    h = hashlib.sha256()
+    for p in sorted(q for q in path.rglob('*') if q.is_file()):
+        h.update(str(p.relative_to(path)).encode())
+        h.update(_content_digest(p).encode())
+    return h.hexdigest()
+
+
+def _write_json(path, obj):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w') as f:
+        json.dump(_jsonable(obj), f, indent=2)
+
+
+def _read_json(path):
+    with Path(path).open() as f:
+        return json.load(f)
+
+
+# --- stages -----------------------------------------------------------------
+
+def _arm_params(cfg, root):
+    from .spiral_arms import load_arm_params, parametric_arms
+    csv_path = paths.data_dir(root) / cfg['arm_csv']
+    if csv_path.exists():
+        return load_arm_params(csv_path)
+    return parametric_arms(n_arms=cfg['n_arms'], pitch_deg=cfg['pitch_deg'], R_ref=cfg['R0_pc'])
+
+
+def shell_stage(cfg, results, root, tel):
+    """Stream the shell Monte Carlo; write g_star_results.json and the per-sample columns."""
+    from .shell import LY_TO_PC, ShellAccumulator, compute_sigma0, iter_shell_chunks, shell_volume
+    from .spiral_arms import min_arm_separation
+    from .store import ColumnWriter
+
+    r1, r2 = cfg['r1_ly'] * LY_TO_PC, cfg['r2_ly'] * LY_TO_PC
+    arm_params = _arm_params(cfg, root)
+    sigma0 = compute_sigma0(cfg['N_total_G'], cfg['Rd'], cfg['Rmax'])
+    acc = ShellAccumulator(shell_volume(r1, r2))
+    columns = dict(x_sun=np.float64, y_sun=np.float64, R_gc=np.float64, Z_gc=np.float64,
+                   rho=np.float64, sep_min=np.float64, in_arm=np.bool_)
+    writer = ColumnWriter(paths.output_path('g_star_samples', results), cfg['N_mc'], columns)
+    start = 0
+    chunks = iter_shell_chunks(cfg['N_mc'], r1, r2, cfg['R0_pc'], sigma0, cfg['Rd'], cfg['hz'], seed=cfg['seed'])
+    for chunk in tel.iterate('sampling', chunks, samples=lambda c: c['rho'].size):
+        n = chunk['rho'].size
+        with tel.stage('arm_membership', samples=n):
+            chunk['sep_min'] = min_arm_separation(chunk['R_gc'], chunk['phi_gc'], arm_params)
+            chunk['in_arm'] = chunk['sep_min'] < cfg['arm_half_width']
+        with tel.stage('density_weighting', samples=n):
+            acc.add(chunk, chunk['in_arm'])
+        with tel.stage('file_io'):
+            writer.write(start, chunk)
+        start += n
+
+    result = acc.result()
+    result['params'] = {k: cfg[k] for k in ('R0_pc', 'Rd', 'hz', 'arm_half_width', 'N_total_G')}
+    result['seed'] = cfg['seed']
+    with tel.stage('file_io'):
+        writer.close(metadata=dict(V_shell=result['V_shell'], r1=r1, r2=r2))
+    result['provenance'] = tel.provenance(stage='shell')
+    _write_json(paths.output_path('g_star_results', results), result)
+
+
+def radial_profile_stage(cfg, results, root, tel):
+    """Expected shell / in-arm counts for every thin shell of the radial profile in one pass."""
+    from .radial_profile import RadialProfileAccumulator, iter_profile_chunks, profile_edges
+    from .shell import compute_sigma0
+    from .spiral_arms import min_arm_separation
+    from .store import save_grid
+
+    r_edges = profile_edges(cfg['profile_r_min_ly'], cfg['profile_r_max_ly'], cfg['profile_shells'])
+    arm_params = _arm_params(cfg, root)
+    sigma0 = compute_sigma0(cfg['N_total_G'], cfg['Rd'], cfg['Rmax'])
+    acc = RadialProfileAccumulator(r_edges)
+    chunks = iter_profile_chunks(cfg['profile_samples_per_shell'], r_edges, cfg['R0_pc'], sigma0, cfg['Rd'],
+                                 cfg['hz'], seed=cfg['seed'])
+    for chunk in tel.iterate('sampling', chunks, samples=lambda c: c['rho'].size):
+        n = chunk['rho'].size
+        with tel.stage('arm_membership', samples=n):
+            in_arm = min_arm_separation(chunk['R_gc'], chunk['phi_gc'], arm_params) < cfg['arm_half_width']
+        with tel.stage('density_weighting', samples=n):
+            acc.add(chunk, in_arm)
+    params = {k: cfg[k] for k in ('R0_pc', 'Rd', 'hz', 'arm_half_width', 'N_total_G', 'seed')}
+    with tel.stage('file_io'):
+        save_grid(paths.output_path('g_star_radial_profile', results), acc.result(),
+                  metadata=dict(params=params, provenance=tel.provenance(stage='radial_profile')))
+
+
+def density_stage(cfg, results, root, tel):
+    """Bin the stored samples into the in-arm / inter-arm density pyramid."""
+    from .density_grid import DensityGrid
+    from .shell import CHUNK_SIZE
+    from .store import load_columns, read_metadata, save_grid
+
+    samples_path = paths.output_path('g_star_samples', results)
+    meta = read_metadata(samples_path)['metadata']
+    cols = load_columns(samples_path)
+    n = len(cols['rho'])
+    r2 = meta['r2']
+    grid = DensityGrid((-r2, r2), (-r2, r2), nbins=cfg['density_nbins'], n_levels=cfg['density_levels'])
+    scale = meta['V_shell'] / n
+    for start in range(0, n, CHUNK_SIZE):
+        sl = slice(start, start + CHUNK_SIZE)
+        with tel.stage('file_io'):
+            x, y, rho, in_arm = (np.asarray(cols[k][sl]) for k in ('x_sun', 'y_sun', 'rho', 'in_arm'))
+        with tel.stage('histogramming', samples=x.size):
+            grid.add(x, y, rho * scale, in_arm)
+    with tel.stage('pyramid'):
+        stored = grid.to_grid()
+    with tel.stage('file_io'):
+        save_grid(paths.output_path('g_star_density_pyramid', results), stored,
+                  metadata=dict(provenance=tel.provenance(stage='density')))
+
+
+def spatial_index_stage(cfg, results, root, tel):
+    """Persist a grid spatial index of the stored samples for radius, box and cone queries."""
+    from .spatial_index import SpatialIndex
+
+    samples_path = paths.output_path('g_star_samples', results)
+    with tel.stage('indexing'):
+        index = SpatialIndex.from_samples(samples_path)
+    index.metadata['provenance'] = tel.provenance(stage='spatial_index')
+    with tel.stage('file_io'):
+        index.save(paths.output_path('g_star_spatial_index', results))
+
+
+def drake_stage(cfg, results, root, tel):
+    """Drake prior Monte Carlo (and the sensitivity scenarios) for the G-star count."""
+    from . import drake
+
+    N_stars = float(_read_json(paths.output_path('g_star_results', results))['N_expected_arms'])
+    n = cfg['drake_samples']
+    with tel.stage('sampling', samples=n):
+        acc = drake.run_drake(n, N_stars, seed=cfg['seed'], fp=cfg['fp'], ne=cfg['ne'], t_star=cfg['t_star'])
+    with tel.stage('quantiles'):
+        summary = acc.result()
+    summary['priors'] = {name: list(spec) for name, spec in drake.DEFAULT_PRIORS.items()}
+    with tel.stage('sensitivity_scenarios', samples=n * len(drake.SENSITIVITY_SCENARIOS)):
+        summary['sensitivity'] = drake.evaluate_scenarios(
+            drake.SENSITIVITY_SCENARIOS, n, N_stars, seed=cfg['seed'],
+            fp=cfg['fp'], ne=cfg['ne'], t_star=cfg['t_star'])
+    summary['provenance'] = tel.provenance(stage='drake')
+    _write_json(paths.output_path('g_drake_results', results), summary)
+
+
+def sensitivity_stage(cfg, results, root, tel):
+    """Deterministic (L, f_i, f_l) grid of P(>=1) and expected N_civ."""
+    from . import drake
+    from .store import save_grid
+
+    N_stars = float(_read_json(paths.output_path('g_star_results', results))['N_expected_arms'])
+    values = np.logspace(-6, 0, cfg['grid_points'])
+    with tel.stage('grid_evaluation', samples=len(cfg['L_values']) * values.size**2):
+        grid = drake.evaluate_grid(N_stars, t_star=cfg['t_star'], L=cfg['L_values'], f_i=values, f_l=values,
+                                   f_c=cfg['fc_fixed'], fp=cfg['fp'], ne=cfg['ne'])
+    with tel.stage('file_io'):
+        save_grid(paths.output_path('g_drake_sensitivity_grid', results), grid,
+                  metadata={'N_stars_used': N_stars, 'provenance': tel.provenance(stage='sensitivity')})
+
+
+def thresholds_stage(cfg, results, root, tel):
+    """Closed-form P(>=1) boundaries, area fractions and threshold table for the grid's box."""
+    from . import thresholds
+    from .store import load_grid, read_metadata
+
+    grid_path = paths.output_path('g_drake_sensitivity_grid', results)
+    grid = load_grid(grid_path)
+    N_stars = read_metadata(grid_path)['metadata']['N_stars_used']
+    x_range = tuple(np.log10(grid.coords['f_l'][[0, -1]]))
+    y_range = tuple(np.log10(grid.coords['f_i'][[0, -1]]))
+    L_values = grid.coords['L'].tolist()
+    common = dict(fp=cfg['fp'], ne=cfg['ne'], t_star=cfg['t_star'], x_range=x_range, y_range=y_range)
+
+    with tel.stage('boundaries'):
+        rows, summary = thresholds.threshold_boundaries(cfg['thresholds'], L_values, N_stars, cfg['fc_fixed'],
+                                                        **common)
+        table = thresholds.threshold_table(cfg['area_fraction_targets'], L_values, N_stars, cfg['fc_fixed'],
+                                           **common)
+    out_csv = paths.output_path('g_drake_thresholds', results)
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with tel.stage('file_io'), out_csv.open('w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['L', 'threshold', 'log10_fl', 'log10_fi'])
+        writer.writeheader()
+        writer.writerows(rows)
+    provenance = tel.provenance(stage='thresholds')
+    _write_json(paths.output_path('g_drake_threshold_summary', results), dict(summary, provenance=provenance))
+    _write_json(paths.output_path('g_drake_threshold_table', results),
+                {'table_rows': table, 'generated_by': 'sumerian_kings.pipeline', 'provenance': provenance})
+
+
+def kings_stage(cfg, results, root, tel):
+    """Rejection-free relativistic speed model for the configured king list."""
+    from . import kings
+    from .store import save_columns
+
+    with tel.stage('file_io'):
+        names, reigns = kings.load_reigns(paths.data_dir(root) / cfg['kings_csv'])
+    with tel.stage('sampling', samples=cfg['kings_samples'] * len(reigns)):
+        speeds = kings.run_kings(reigns, cfg['kings_samples'], seed=cfg['seed'],
+                                 lower_age=cfg['lower_age'], upper_age=cfg['upper_age'])
+    with tel.stage('file_io'):
+        save_columns(paths.output_path('kings_speeds', results), dict(king=np.array(names), reign=reigns, **speeds),
+                     metadata=dict(kings_csv=cfg['kings_csv'], provenance=tel.provenance(stage='kings')))
+
+
+def voyage_stage(cfg, results, root, tel):
+    """Random-walk voyages of the king list and the expected star counts at displacement quantiles."""
+    from . import kings
+    from .shell import LY_TO_PC
+    from .shell_importance import run_stratified_shell_model
+    from .voyage import displacement_shells, iter_voyage_chunks, max_displacement, VoyageAccumulator
+
+    with tel.stage('file_io'):
+        _, reigns = kings.load_reigns(paths.data_dir(root) / cfg['kings_csv'])
+    ages = dict(lower_age=cfg['lower_age'], upper_age=cfg['upper_age'])
+    acc = VoyageAccumulator(max_displacement(reigns, **ages))
+    chunks = iter_voyage_chunks(cfg['voyage_walkers'], reigns, seed=cfg['seed'], **ages)
+    for displacement, path_length in tel.iterate('sampling', chunks, samples=lambda c: c[0].size):
+        with tel.stage('histogramming', samples=displacement.size):
+            acc.add(displacement, path_length)
+    with tel.stage('quantiles'):
+        summary = acc.result()
+        radii = acc.quantile(cfg['voyage_shell_quantiles'])
+
+    arm_params = _arm_params(cfg, root)
+    summary['shells'] = []
+    for q, (r1_ly, r2_ly) in zip(cfg['voyage_shell_quantiles'], displacement_shells(radii)):
+        with tel.stage('shell_counts', samples=cfg['voyage_shell_samples']):
+            counts = run_stratified_shell_model(
+                cfg['voyage_shell_samples'], r1_ly * LY_TO_PC, r2_ly * LY_TO_PC, arm_params, cfg['R0_pc'],
+                cfg['Rd'], cfg['hz'], cfg['Rmax'], cfg['N_total_G'], cfg['arm_half_width'],
+                seed=cfg['seed']).result()
+        summary['shells'].append(dict(quantile=q, r1_ly=r1_ly, r2_ly=r2_ly, **counts))
+    summary['params'] = {k: cfg[k] for k in ('kings_csv', 'lower_age', 'upper_age', 'seed')}
+    summary['provenance'] = tel.provenance(stage='voyage')
+    _write_json(paths.output_path('kings_voyage', results), summary)
+
+
+def figures_stage(cfg, results, root, tel):
+    """Render the summary figures headlessly, in parallel worker processes (Agg)."""
+    from .density_grid import DensityGrid
+    from .render import FigureRenderer, decimate
+    from .spiral_arms import arm_polylines
+    from .store import load_columns, load_grid
+
+    out = paths.output_path('figures', results)
+    dpi = cfg['dpi']
+    arm_lines = [decimate(line, tol=5.0) for line in arm_polylines(_arm_params(cfg, root), cfg['R0_pc'])]
+
+    with FigureRenderer() as renderer:
+        with tel.stage('file_io'):
+            density = DensityGrid.from_grid(load_grid(paths.output_path('g_star_density_pyramid', results)))
+            grid = load_grid(paths.output_path('g_drake_sensitivity_grid', results))
+            with paths.output_path('g_drake_thresholds', results).open(newline='') as f:
+                boundary_rows = list(csv.DictReader(f))
+            speeds = load_columns(paths.output_path('kings_speeds', results), mmap=False)
+            profile = load_grid(paths.output_path('g_star_radial_profile', results))
+            voyage = _read_json(paths.output_path('kings_voyage', results))
+
+        with tel.stage('plotting'):
+            nbins = cfg['figure_bins']
+            x_edges, y_edges = density.edges(nbins)
+            area = density.bin_area(nbins)
+            renderer.submit('density_panels', out / 'g_star_in_vs_inter_density.png', x_edges=x_edges,
+                            y_edges=y_edges, panels=[m / area for m in density.layers(nbins)],
+                            titles=('In-arm density (per pc^2)', 'Inter-arm density (per pc^2)'),
+                            overlays=arm_lines, dpi=dpi)
+
+            fl, fi = np.log10(grid.coords['f_l']), np.log10(grid.coords['f_i'])
+            for k, L in enumerate(grid.coords['L']):
+                lines = []
+                for t in cfg['thresholds']:
+                    seg = [(float(r['log10_fl']), float(r['log10_fi'])) for r in boundary_rows
+                           if int(r['L']) == int(L) and math.isclose(float(r['threshold']), t)]
+                    if seg:
+                        xs, ys = zip(*seg)
+                        lines.append((xs, ys, None, f'P(≥1) = {t}'))
+                renderer.submit('log_heatmap', out / f'g_drake_thresholds_L{int(L)}.png',
+                                values=np.asarray(grid['p_any'][k]), extent=(fl[0], fl[-1], fi[0], fi[-1]),
+                                title=f'log10(P(≥1)) for L={int(L):,} yr', lines=lines, dpi=dpi)
+
+            renderer.submit('band', out / 'kings_speeds.png', labels=speeds['king'], mean=speeds['b_mean'],
+                            lower=speeds['b_lower'], upper=speeds['b_upper'],
+                            ylabel='Estimated Speed (units of c)',
+                            title='Monte Carlo Estimates of Speed with Uncertainty Band',
+                            mean_label='Mean Speed', band_label='5-95% Speed', dpi=dpi)
+
+            renderer.submit('profile', out / 'g_star_radial_profile.png', r=profile.coords['r_ly'],
+                            series=[(profile['N_expected_shell'], profile['N_expected_shell_se'], 'Whole shell'),
+                                    (profile['N_expected_arms'], profile['N_expected_arms_se'], 'In arms')],
+                            xlabel='Shell radius (ly) [Sun-centered]', ylabel='Expected G stars per shell',
+                            title=f"Expected G stars per {np.diff(profile['r1_ly'][:2]).item():,.0f} ly shell",
+                            marks=[(0.5 * (cfg['r1_ly'] + cfg['r2_ly']), 'Configured shell')], dpi=dpi)
+
+            counts = np.asarray(voyage['hists']['displacement'])
+            used = np.flatnonzero(counts)[-1] + 1  # the edges reach the longest possible voyage
+            renderer.submit('histograms', out / 'kings_voyage_displacement.png', panels=[dict(
+                edges=voyage['hist_edges_ly'][:used + 1], series=[(counts[:used], None, 'steelblue')],
+                median=voyage['displacement_median_ly'], xlabel='Net displacement from Earth (ly)',
+                title=f"Random-walk voyage: {voyage['n_walkers']:,} walkers")], dpi=dpi)
+            renderer.wait()
+
+
+SHELL_PARAMS = ('r1_ly', 'r2_ly', 'R0_pc', 'Rd', 'hz', 'Rmax', 'arm_half_width', 'N_total_G', 'arm_csv',
+                'n_arms', 'pitch_deg', 'N_mc', 'seed')
+DRAKE_PARAMS = ('fp', 'ne', 't_star')
+
+STAGES = {s.name: s for s in (
+    Stage('shell', shell_stage, params=SHELL_PARAMS, data=('arm_csv',),
+          outputs=('g_star_results', 'g_star_samples')),
+    Stage('density', density_stage, params=('density_nbins', 'density_levels'),
+          inputs=('g_star_samples',), outputs=('g_star_density_pyramid',)),
+    Stage('spatial_index', spatial_index_stage, inputs=('g_star_samples',), outputs=('g_star_spatial_index',)),
+    Stage('drake', drake_stage, params=DRAKE_PARAMS + ('drake_samples', 'seed'),
+          inputs=('g_star_results',), outputs=('g_drake_results',)),
+    Stage('sensitivity', sensitivity_stage, params=DRAKE_PARAMS + ('fc_fixed', 'L_values', 'grid_points'),
+          inputs=('g_star_results',), outputs=('g_drake_sensitivity_grid',)),
+    Stage('thresholds', thresholds_stage, params=DRAKE_PARAMS + ('fc_fixed', 'thresholds', 'area_fraction_targets'),
+          inputs=('g_drake_sensitivity_grid',),
+          outputs=('g_drake_thresholds', 'g_drake_threshold_summary', 'g_drake_threshold_table')),
+    Stage('radial_profile', radial_profile_stage,
+          params=('profile_r_min_ly', 'profile_r_max_ly', 'profile_shells', 'profile_samples_per_shell', 'R0_pc',
+                  'Rd', 'hz', 'Rmax', 'arm_half_width', 'N_total_G', 'arm_csv', 'n_arms', 'pitch_deg', 'seed'),
+          data=('arm_csv',), outputs=('g_star_radial_profile',)),
+    Stage('kings', kings_stage, params=('kings_csv', 'kings_samples', 'lower_age', 'upper_age', 'seed'),
+          data=('kings_csv',), outputs=('kings_speeds',)),
+    Stage('voyage', voyage_stage,
+          params=('kings_csv', 'lower_age', 'upper_age', 'seed', 'voyage_walkers', 'voyage_shell_quantiles',
+                  'voyage_shell_samples', 'R0_pc', 'Rd', 'hz', 'Rmax', 'arm_half_width', 'N_total_G', 'arm_csv',
+                  'n_arms', 'pitch_deg'),
+          data=('kings_csv', 'arm_csv'), outputs=('kings_voyage',)),
+    Stage('figures', figures_stage, params=('figure_bins', 'dpi', 'thresholds', 'r1_ly', 'r2_ly'),
+          inputs=('g_star_density_pyramid', 'g_drake_sensitivity_grid', 'g_drake_thresholds', 'kings_speeds',
+                  'g_star_radial_profile', 'kings_voyage'),
+          outputs=('figures',)),
+)}
+
+
+# --- scheduling -------------------------------------------------------------
+
+def _producers():
+    return {out: stage.name for stage in STAGES.values() for out in stage.outputs}
+
+
+def dependencies(name):
+    """Names of the stages whose outputs ``name`` reads."""
+    producers = _producers()
+    return sorted({producers[i] for i in STAGES[name].inputs})
+
+
+def closure(targets):
+    """``targets`` and everything upstream of them, in dependency order."""
+    order, seen = [], set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for dep in dependencies(name):
+            visit(dep)
+        order.append(name)
+
+    for name in targets:
+        if name not in STAGES:
+            raise KeyError(f"Unknown stage {name!r}; stages: {', '.join(STAGES)}")
+        visit(name)
+    return order
+
+
+class Pipeline:
+    """Runs stages under ``root`` (Data/ and Results/), skipping those that are up to date."""
+
+    def __init__(self, config=None, root=None, results=None):
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.root = Path(root or paths.PROJECT_ROOT)
+        self.results = Path(results or paths.results_dir(self.root))
+        self.state_path = self.results / STATE_FILE
+
+    def load_state(self):
+        return _read_json(self.state_path) if self.state_path.exists() else {}
+
+    def _save_state(self, state):
+        _write_json(self.state_path, state)
+
+    def fingerprint(self, name):
+        """cache_key of the stage's config values and the digests of its inputs."""
+        stage = STAGES[name]
+        files = [paths.data_dir(self.root) / self.config[key] for key in stage.data]
+        files += [paths.output_path(out, self.results) for out in stage.inputs]
+        missing = [str(p) for p in files if not p.exists()]
+        if missing:
+            return None
+        params = {key: self.config[key] for key in stage.params}
+        params['stage'] = name
+        params['inputs'] = [path_digest(p) for p in files]
+        return cache_key(params)
+
+    def is_stale(self, name, state=None):
+        state = self.load_state() if state is None else state
+        outputs_exist = all(paths.output_path(out, self.results).exists() for out in STAGES[name].outputs)
+        fp = self.fingerprint(name)
+        return fp is None or not outputs_exist or state.get(name, {}).get('fingerprint') != fp
+
+    def status(self):
+        """``{stage: 'stale' | 'up to date'}`` for every stage (upstream outputs as they are now)."""
+        state = self.load_state()
+        return {name: 'stale' if self.is_stale(name, state) else 'up to date' for name in STAGES}
+
+    def run(self, targets=None, force=(), jobs=1, log=print):
+        """Run ``targets`` (default: all) and their stale upstream stages.
+
+        Stages named in ``force`` rerun even if up to date.  With ``jobs`` > 1,
+        stages whose dependencies are done run concurrently in worker
+        processes.  Returns ``{stage: 'ran' | 'skipped'}``.
+        """
+        # the process pool machinery is only imported when a run needs it
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+        order = closure(targets or list(STAGES))
+        state = self.load_state()
+        pending = {name: set(dependencies(name)) & set(order) for name in order}
+        outcome = {}
+        executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        running = {}
+        try:
+            while pending or running:
+                ready = [name for name, deps in pending.items() if not deps]
+                for name in ready:
+                    del pending[name]
+                    if name not in force and not self.is_stale(name, state):
+                        outcome[name] = 'skipped'
+                        log(f"[{name}] up to date")
+                        self._finish(name, pending)
+                        continue
+                    log(f"[{name}] running")
+                    args = (name, STAGES[name].func, self.config, self.results, self.root)
+                    if executor is None:
+                        running[name] = _run_stage(*args)
+                    else:
+                        running[name] = executor.submit(_run_stage, *args)
+                if not running:
+                    continue
+                if executor is None:
+                    done_names = list(running)
+                else:
+                    done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+                    done_names = [n for n, f in running.items() if f in done]
+                for name in done_names:
+                    item = running.pop(name)
+                    elapsed, performance = item if executor is None else item.result()
+                    state[name] = dict(fingerprint=self.fingerprint(name), seconds=elapsed,
+                                       finished=time.strftime('%Y-%m-%dT%H:%M:%S'), performance=performance)
+                    self._save_state(state)
+                    outcome[name] = 'ran'
+                    log(f"[{name}] done in {elapsed:.1f} s")
+                    self._finish(name, pending)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        return outcome
+
+    @staticmethod
+    def _finish(name, pending):
+        for deps in pending.values():
+            deps.discard(name)
+
+
+def _run_stage(name, func, cfg, results, root):
+    tel = Telemetry(label=name)
+    start = time.perf_counter()
+    func(cfg, results, root, tel)
+    return time.perf_counter() - start, tel.report()
@@ -0,0 +1,310 @@
+"""
+Figure rendering off the compute path.
+
+Figures are described by plain data (binned grids, histogram counts,
+overlay polylines) and rendered by a ``FigureRenderer``: a process pool in
+which every job builds its own ``matplotlib.figure.Figure`` on an Agg canvas
+(no pyplot, so jobs share no global figure state) and writes one file.
+``submit`` returns at once, so a compute stage hands its figures off and
+carries on; ``wait()`` returns the written paths.  Interactive HTML (plotly)
+goes through the same pool.
+
+Arm overlays come from ``spiral_arms.arm_polylines`` once per run, thinned by
+``decimate`` to a tolerance in data units: points closer together than a
+pixel add nothing to an overlay.
+
+    with FigureRenderer() as renderer:
+        renderer.submit('density_map', out / 'map.png', x_edges=x_edges, y_edges=y_edges,
+                        values=counts, overlays=arm_lines, log=True)
+        ...  # keep computing
+    # every figure has been written here
+
+matplotlib (and plotly for HTML) is only imported inside the workers.
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+
+def decimate(line, tol):
+    """Drop points of a ``(name, x, y)`` polyline closer than ``tol`` (along the curve) to the last kept one."""
+    name, x, y = line
+    step = np.hypot(np.diff(x), np.diff(y))
+    s = np.concatenate([[0.0], np.cumsum(step)])
+    _, keep = np.unique(np.floor(s / tol), return_index=True)
+    if keep[-1] != x.size - 1:
+        keep = np.append(keep, x.size - 1)
+    return name, x[keep], y[keep]
+
+
+def top_bins(hist, x_edges, y_edges, top_n=5):
+    """Centres and values ``[(x, y, value), ...]`` of the ``top_n`` largest positive bins."""
+    flat = hist.ravel()
+    order = np.argsort(flat)[::-1][:top_n]
+    out = []
+    for idx in order[flat[order] > 0]:
+        ix, iy = np.unravel_index(idx, hist.shape)
+        out.append((0.5 * (x_edges[ix] + x_edges[ix + 1]), 0.5 * (y_edges[iy] + y_edges[iy + 1]), float(flat[idx])))
+    return out
+
+
+# --- renderers (run in the worker processes) --------------------------------
+
+def _figure(figsize):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _log_norm(*arrays, vmin=None):
+    from matplotlib.colors import LogNorm
+    positive = np.concatenate([a[a > 0].ravel() for a in arrays])
+    if vmin is not None:
+        return LogNorm(vmin=vmin, vmax=max(positive.max() if positive.size else vmin, vmin))
+    if positive.size:
+        return LogNorm(vmin=positive.min(), vmax=positive.max())
+    return LogNorm(vmin=1e-8, vmax=1.0)
+
+
+def _map_axes(ax, x_edges, y_edges, overlays, color=None, lw=2.0, label_arms=False, sun_size=100, sun_label=None):
+    for name, x, y in overlays:
+        ax.plot(x, y, '-', lw=lw, alpha=0.9, color=color, label=name if label_arms else None)
+    # the arm loci span the whole disk: keep the view on the mapped region
+    ax.set_xlim(x_edges[0], x_edges[-1])
+    ax.set_ylim(y_edges[0], y_edges[-1])
+    ax.scatter(0.0, 0.0, c='gold', edgecolor='k', s=sun_size, zorder=10, label=sun_label)
+    ax.set_aspect('equal', 'box')
+    ax.set_xlabel('x (pc) [Sun-centered]')
+    ax.set_ylabel('y (pc) [Sun-centered]')
+
+
+def _text_box(ax, text):
+    ax.text(0.02, 0.98, text, transform=ax.transAxes, va='top', bbox=dict(facecolor='white', alpha=0.6))
+
+
+def render_density_map(path, x_edges, y_edges, values, overlays=(), log=False, vmin=None, cmap='viridis',
+                       colorbar_label='', title='', annotation=None, label_arms=False, figsize=(8, 8), dpi=200):
+    """One (x, y) map of ``values`` (indexed [ix, iy]) with arm overlays and the Sun."""
+    fig = _figure(figsize)
+    ax = fig.add_subplot()
+    norm = _log_norm(values, vmin=vmin) if log else None
+    mesh = ax.pcolormesh(x_edges, y_edges, np.asarray(values).T, norm=norm, cmap=cmap, shading='auto')
+    fig.colorbar(mesh, ax=ax, label=colorbar_label)
+    _map_axes(ax, x_edges, y_edges, overlays, label_arms=label_arms, sun_label='Sun' if label_arms else None)
+    if label_arms:
+        ax.legend(loc='upper right', fontsize='small', ncol=1)
+    if annotation:
+        _text_box(ax, annotation)
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    return str(path)
+
+
+def render_density_panels(path, x_edges, y_edges, panels, titles, overlays=(), cmap='inferno',
+                          colorbar_label='Expected G stars per pc^2', annotations=None, suptitle=None,
+                          figsize=(14, 6), dpi=200):
+    """Side-by-side maps on one shared log colour scale; ``annotations[k]`` is a list of (x, y, text)."""
+    fig = _figure(figsize)
+    axes = fig.subplots(1, len(panels), sharex=True, sharey=True)
+    norm = _log_norm(*panels)
+    for k, (ax, values, title) in enumerate(zip(axes, panels, titles)):
+        mesh = ax.pcolormesh(x_edges, y_edges, np.asarray(values).T, norm=norm, cmap=cmap, shading='auto')
+        fig.colorbar(mesh, ax=ax, label=colorbar_label)
+        ax.set_title(title)
+        _map_axes(ax, x_edges, y_edges, overlays, color='white', lw=1.5, sun_size=60)
+        for x, y, text in (annotations[k] if annotations else ()):
+            ax.scatter(x, y, s=80, facecolors='none', edgecolors='cyan', linewidths=1.5)
+            ax.text(x, y, text, color='cyan', fontsize=8, ha='center', va='center',
+                    bbox=dict(facecolor='black', alpha=0.5, pad=1))
+    if suptitle:
+        fig.suptitle(suptitle)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    return str(path)
+
+
+def render_histograms(path, panels, figsize=None, dpi=150):
+    """Precomputed histograms, one panel per dict of ``edges``, ``series`` [(counts, label, color)],
+    optional ``median`` (x position), ``xlabel``, ``ylabel`` and ``title``."""
+    fig = _figure(figsize or (max(8, 16 / 3 * len(panels)), 4))
+    axes = np.atleast_1d(fig.subplots(1, len(panels)))
+    for ax, panel in zip(axes, panels):
+        for counts, label, color in panel['series']:
+            ax.stairs(counts, panel['edges'], fill=True, color=color, alpha=0.7, label=label)
+        if panel.get('median') is not None:
+            ax.axvline(panel['median'], color='red', linestyle='--', linewidth=2, label='Median')
+        ax.set_xlabel(panel.get('xlabel', ''))
+        ax.set_ylabel(panel.get('ylabel', 'Frequency'))
+        ax.set_title(panel.get('title', ''))
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    return str(path)
+
+
+def render_log_heatmap(path, values, extent, title, lines=(), eps=1e-30, colorbar_label='log10(P(≥1))',
+                       xlabel='log10(f_l)', ylabel='log10(f_i)', figsize=(6, 5), dpi=150):
+    """``log10(values + eps)`` as an image over ``extent``, with straight ``lines`` [(xs, ys, color, label)]."""
+    fig = _figure(figsize)
+    ax = fig.add_subplot()
+    img = ax.imshow(np.log10(np.asarray(values) + eps), origin='lower', aspect='auto', extent=extent, cmap='viridis')
+    fig.colorbar(img, ax=ax, label=colorbar_label)
+    for xs, ys, color, label in lines:
+        ax.plot(xs, ys, color=color, lw=1.5, label=label)
+    if lines:
+        ax.legend(loc='lower left', fontsize='small')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    return str(path)
+
+
+def render_bar_line(path, names, bars, line, bar_label, line_label, title, colors=None, figsize=(6, 4), dpi=150):
+    """Bars on the left axis and a marked line on the right axis over the same categories."""
+    fig = _figure(figsize)
+    ax1 = fig.add_subplot()
+    ax1.bar(names, bars, color=colors, alpha=0.7)
+    ax1.set_ylabel(bar_label)
+    ax1.set_ylim(0, max(bars) * 1.2 if max(bars) > 0 else 1)
+    ax2 = ax1.twinx()
+    ax2.plot(names, line, marker='o', color='black', label=line_label)
+    ax2.set_ylabel(line_label)
+    ax2.set_ylim(0, max(line) * 1.2 if max(line) > 0 else 1)
+    ax1.set_title(title)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    return str(path)
+
+
+def render_band(path, labels, mean, lower, upper, ylabel, title, mean_label='Mean', band_label='5-95%',
+                figsize=(14, 6), dpi=150):
+    """Per-category mean with a shaded lower/upper band (the kings speed plot)."""
+    fig = _figure(figsize)
+    ax = fig.add_subplot()
+    t = np.arange(len(labels))
+    ax.plot(t, mean, marker='o', label=mean_label)
+    ax.fill_between(t, lower, upper, alpha=0.2, label=band_label)
+    ax.set_xticks(t)
+    ax.set_xticklabels(labels, rotation=90)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    return str(path)
+
+
+def render_profile(path, r, series, xlabel, ylabel, title, marks=(), log=False, figsize=(9, 5), dpi=150):
+    """Curves over a continuous axis ``r``, one per ``series`` (values, se, label) with a +/-2 se band,
+    and dashed vertical ``marks`` [(x, label)]."""
+    fig = _figure(figsize)
+    ax = fig.add_subplot()
+    for values, se, label in series:
+        values = np.asarray(values)
+        line, = ax.plot(r, values, label=label)
+        if se is not None:
+            ax.fill_between(r, values - 2 * np.asarray(se), values + 2 * np.asarray(se),
+                            color=line.get_color(), alpha=0.2, linewidth=0)
+    for x, label in marks:
+        ax.axvline(x, color='gray', linestyle='--', linewidth=1, label=label)
+    if log:
+        ax.set_yscale('log')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    return str(path)
+
+
+def render_density_html(path, x_centers, y_centers, panels, titles, overlays=(), title='', height=650, width=1100):
+    """Interactive plotly heatmaps of ``panels`` with arm overlays and the Sun (requires plotly)."""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(rows=1, cols=len(panels), subplot_titles=titles, shared_yaxes=True)
+    hover = 'x:%{x:.0f}<br>y:%{y:.0f}<br>dens:%{z:.3e}<extra></extra>'
+    for col, values in enumerate(panels, start=1):
+        fig.add_trace(go.Heatmap(x=x_centers, y=y_centers, z=np.asarray(values).T, colorscale='Inferno',
+                                 colorbar=dict(title='G stars/pc^2'), hovertemplate=hover), row=1, col=col)
+        for _, x, y in overlays:
+            fig.add_trace(go.Scatter(x=x, y=y, mode='lines', line=dict(color='white', width=1.5), showlegend=False),
+                          row=1, col=col)
+        fig.add_trace(go.Scatter(x=[0], y=[0], mode='markers', name='Sun', showlegend=col == 1,
+                                 marker=dict(color='gold', size=10, line=dict(color='black', width=1))),
+                      row=1, col=col)
+    fig.update_layout(height=height, width=width, title_text=title)
+    fig.write_html(str(path))
+    return str(path)
+
+
+RENDERERS = {
+    'density_map': render_density_map,
+    'density_panels': render_density_panels,
+    'histograms': render_histograms,
+    'log_heatmap': render_log_heatmap,
+    'bar_line': render_bar_line,
+    'band': render_band,
+    'profile': render_profile,
+    'density_html': render_density_html,
+}
+
+
+def render(kind, path, **spec):
+    """Render one figure in this process; returns the path written."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    return RENDERERS[kind](path, **spec)
+
+
+class FigureRenderer:
+    """Renders submitted figures in worker processes (``inline=True``: in this process, for debugging)."""
+
+    def __init__(self, max_workers=None, inline=False):
+        self._executor = None if inline else ProcessPoolExecutor(max_workers=max_workers)
+        self._futures = []
+
+    def submit(self, kind, path, **spec):
+        """Queue one figure (``kind`` in RENDERERS); returns a Future of the written path."""
+        if kind not in RENDERERS:
+            raise KeyError(f"Unknown figure kind {kind!r}; kinds: {', '.join(RENDERERS)}")
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(render(kind, path, **spec))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self._executor.submit(render, kind, path, **spec)
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        """Block until every submitted figure is written; returns their paths (re-raises a failed job)."""
+        futures, self._futures = self._futures, []
+        return [f.result() for f in futures]
+
+    def close(self):
+        try:
+            return self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
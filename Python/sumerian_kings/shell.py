@@ -0,0 +1,229 @@
+"""
+Streaming Monte Carlo sampler for Earth-centred spherical shells.
+
+Points are drawn uniformly in the shell volume r1 <= r <= r2 around the Sun,
+converted to Galactocentric coordinates (Sun at (R0, 0, 0)) and weighted by the
+exponential disk density used throughout the notebooks:
+
+    rho = sigma0 * exp(-R_gc/Rd) / (2*hz) * exp(-|Z_gc|/hz)
+
+``iter_shell_chunks`` yields fixed-size chunks so a run of 1e8+ samples never
+holds more than one chunk in memory.  Each coordinate (r, cos(theta), phi) has
+its own child stream of the run's ``SeedSequence``; since a numpy Generator
+produces the same values whether a stream is drawn in one call or in pieces,
+the chunked path gives exactly the same samples as ``sample_shell`` for the
+same seed, whatever the chunk size.
+
+``ShellAccumulator`` folds the stream into the notebook's estimates
+(N_expected_shell, N_expected_arms, frac_points_in_arm) and the weighted
+in-arm / inter-arm density grids.
+"""
+
+import math
+
+import numpy as np
+
+from .spiral_arms import min_arm_separation
+
+
+LY_TO_PC = 0.306601
+
+# Rough peak bytes held per sample inside one chunk: the coordinate arrays
+# yielded below plus the float32 temporaries of the arm-separation search.
+BYTES_PER_SAMPLE = 256
+CHUNK_SIZE = 1 << 18
+
+
+def compute_sigma0(N_total, Rd, Rmax):
+    """Central surface density (pc^-2) normalising N_total stars inside Rmax."""
+    # integral of 2π R exp(-R/Rd) dR from 0..Rmax
+    integral = 2 * math.pi * Rd**2 * (1 - math.exp(-Rmax/Rd)*(1 + Rmax/Rd))
+    return N_total / integral
+
+
+def shell_volume(r1, r2):
+    """Volume (pc^3) of the spherical shell between r1 and r2 (pc)."""
+    return 4.0/3.0 * math.pi * (r2**3 - r1**3)
+
+
+def disk_density(R_gc, Z_gc, sigma0, Rd, hz):
+    """Volumetric density (pc^-3) of the exponential disk."""
+    sigma = sigma0 * np.exp(-R_gc / Rd)
+    return sigma / (2.0 * hz) * np.exp(-np.abs(Z_gc) / hz)
+
+
+def chunk_size_for_budget(memory_budget):
+    """Largest chunk (samples) whose working set fits in ``memory_budget`` bytes."""
+    return max(1, int(memory_budget) // BYTES_PER_SAMPLE)
+
+
+def _coordinate_streams(seed):
+    """Independent Generators for r, cos(theta) and phi spawned from ``seed``."""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(s) for s in seed.spawn(3)]
+
+
+def shell_points(r, cos_theta, phi, R0_pc, sigma0, Rd, hz):
+    """Chunk dict (see ``iter_shell_chunks``) for Sun-centred spherical coordinates."""
+    sin_theta = np.sqrt(1.0 - cos_theta**2)
+
+    # positions in Sun-centered Cartesian coordinates (pc)
+    x_sun = r * sin_theta * np.cos(phi)
+    y_sun = r * sin_theta * np.sin(phi)
+    z_sun = r * cos_theta
+
+    # Galactocentric coordinates: Sun at (R0, 0, 0)
+    X_gc = R0_pc + x_sun
+    R_gc = np.sqrt(X_gc**2 + y_sun**2)
+    phi_gc = np.arctan2(y_sun, X_gc)  # -pi..pi
+
+    return dict(
+        x_sun=x_sun, y_sun=y_sun, z_sun=z_sun,
+        X_gc=X_gc, Y_gc=y_sun, Z_gc=z_sun, R_gc=R_gc, phi_gc=phi_gc,
+        rho=disk_density(R_gc, z_sun, sigma0, Rd, hz),
+    )
+
+
+def iter_shell_chunks(n_samples, r1, r2, R0_pc, sigma0, Rd, hz, seed=None, chunk_size=CHUNK_SIZE):
+    """Yield dicts of positions and densities for ``n_samples`` shell points.
+
+    Each chunk holds ``chunk_size`` points (the last may be shorter) with keys
+    x_sun, y_sun, z_sun (Sun-centred, pc), X_gc, Y_gc, Z_gc, R_gc, phi_gc
+    (Galactocentric, pc / radians) and rho (pc^-3).
+    """
+    rng_r, rng_cos, rng_phi = _coordinate_streams(seed)
+    for start in range(0, n_samples, chunk_size):
+        n = min(chunk_size, n_samples - start)
+        u = rng_r.uniform(r1**3, r2**3, size=n)
+        r = u ** (1.0/3.0)
+        cos_theta = rng_cos.uniform(-1.0, 1.0, size=n)
+        phi = rng_phi.uniform(0.0, 2.0*math.pi, size=n)
+        yield shell_points(r, cos_theta, phi, R0_pc, sigma0, Rd, hz)
+
+
+def sample_shell(n_samples, r1, r2, R0_pc, sigma0, Rd, hz, seed=None):
+    """In-memory counterpart of ``iter_shell_chunks``: one chunk of all samples."""
+    return next(iter_shell_chunks(n_samples, r1, r2, R0_pc, sigma0, Rd, hz, seed=seed,
+                                  chunk_size=max(1, n_samples)))
+
+
+class ShellAccumulator:
+    """Streaming reducer for shell chunks.
+
+    Keeps running sums of rho, rho^2 and the in-arm counterparts, and
+    optionally the rho-weighted 2-D histograms of (x_sun, y_sun) for in-arm and
+    inter-arm points on fixed ``x_edges``/``y_edges``.  Histograms are kept as
+    sums of rho and scaled by V_shell / n at the end, so accumulators from
+    separate streams can be merged without knowing the total sample count
+    up front.  A ``density_grid.DensityGrid`` passed as ``grid`` is filled
+    the same way (sums of rho) and merged with the other accumulator's grid;
+    ``density_grid()`` returns it scaled to expected counts.
+    """
+
+    def __init__(self, V_shell, x_edges=None, y_edges=None, grid=None):
+        self.V_shell = V_shell
+        self.grid = grid
+        self.x_edges = x_edges
+        self.y_edges = y_edges
+        self.n = 0
+        self.n_in_arm = 0
+        self.sum_rho = 0.0
+        self.sum_rho2 = 0.0
+        self.sum_rho_arm = 0.0
+        self.sum_rho_arm2 = 0.0
+        if x_edges is not None:
+            shape = (len(x_edges) - 1, len(y_edges) - 1)
+            self.hist_in = np.zeros(shape)
+            self.hist_out = np.zeros(shape)
+        else:
+            self.hist_in = self.hist_out = None
+
+    def add(self, chunk, in_arm):
+        rho = chunk['rho']
+        rho_arm = rho[in_arm]
+        self.n += rho.size
+        self.n_in_arm += int(np.count_nonzero(in_arm))
+        self.sum_rho += float(np.sum(rho))
+        self.sum_rho2 += float(np.dot(rho, rho))
+        self.sum_rho_arm += float(np.sum(rho_arm))
+        self.sum_rho_arm2 += float(np.dot(rho_arm, rho_arm))
+        if self.hist_in is not None:
+            x, y = chunk['x_sun'], chunk['y_sun']
+            bins = [self.x_edges, self.y_edges]
+            self.hist_in += np.histogram2d(x[in_arm], y[in_arm], bins=bins, weights=rho_arm)[0]
+            self.hist_out += np.histogram2d(x[~in_arm], y[~in_arm], bins=bins, weights=rho[~in_arm])[0]
+        if self.grid is not None:
+            self.grid.add(chunk['x_sun'], chunk['y_sun'], rho, in_arm)
+        return self
+
+    def merge(self, other):
+        self.n += other.n
+        self.n_in_arm += other.n_in_arm
+        self.sum_rho += other.sum_rho
+        self.sum_rho2 += other.sum_rho2
+        self.sum_rho_arm += other.sum_rho_arm
+        self.sum_rho_arm2 += other.sum_rho_arm2
+        if self.hist_in is not None:
+            self.hist_in += other.hist_in
+            self.hist_out += other.hist_out
+        if self.grid is not None:
+            self.grid.merge(other.grid)
+        return self
+
+    def _expected(self, s, s2):
+        """Expected count V * mean(x) and its Monte Carlo standard error."""
+        mean = s / self.n
+        var = max(s2 / self.n - mean**2, 0.0)
+        return mean * self.V_shell, math.sqrt(var / self.n) * self.V_shell
+
+    def result(self):
+        N_shell, N_shell_se = self._expected(self.sum_rho, self.sum_rho2)
+        N_arms, N_arms_se = self._expected(self.sum_rho_arm, self.sum_rho_arm2)
+        return dict(
+            V_shell=self.V_shell,
+            N_expected_shell=N_shell,
+            N_expected_shell_se=N_shell_se,
+            N_expected_arms=N_arms,
+            N_expected_arms_se=N_arms_se,
+            frac_points_in_arm=self.n_in_arm / self.n,
+            N_mc=self.n,
+        )
+
+    def density_grids(self):
+        """Expected counts per bin (hist_in, hist_out), as the notebook's histogram2d."""
+        scale = self.V_shell / self.n
+        return self.hist_in * scale, self.hist_out * scale
+
+    def density_grid(self):
+        """Copy of ``grid`` with its weights scaled to expected counts (rho * V_shell / n)."""
+        from .density_grid import DensityGrid
+        out = DensityGrid(self.grid.x_range, self.grid.y_range, nbins=self.grid.nbins, n_levels=self.grid.n_levels)
+        out.weights = self.grid.weights * (self.V_shell / self.n)
+        out.counts = self.grid.counts.copy()
+        out.n = self.grid.n
+        return out
+
+
+def run_shell_model(N_mc, r1, r2, arm_params, R0_pc, Rd, hz, Rmax, N_total, arm_half_width,
+                    seed=None, memory_budget=None, chunk_size=CHUNK_SIZE, nbins=None, grid=None):
+    """Stream ``N_mc`` shell samples through arm membership and the reducers.
+
+    ``memory_budget`` (bytes) overrides ``chunk_size``.  With ``nbins`` set,
+    weighted nbins x nbins density grids spanning [-r2, r2] are accumulated.
+    A ``density_grid.DensityGrid`` passed as ``grid`` is filled with every
+    sample (all resolutions, no subsampling) and carried on the accumulator,
+    so grids from ``parallel.parallel_shell_model`` workers merge like the
+    other sums; read the expected counts from ``acc.density_grid()``, which
+    scales by the total sample count once.  Returns the filled
+    ``ShellAccumulator``; call ``.result()`` for the notebook's result dict.
+    """
+    if memory_budget is not None:
+        chunk_size = chunk_size_for_budget(memory_budget)
+    sigma0 = compute_sigma0(N_total, Rd, Rmax)
+    edges = np.linspace(-r2, r2, nbins + 1) if nbins else None
+    acc = ShellAccumulator(shell_volume(r1, r2), x_edges=edges, y_edges=edges, grid=grid)
+    for chunk in iter_shell_chunks(N_mc, r1, r2, R0_pc, sigma0, Rd, hz, seed=seed, chunk_size=chunk_size):
+        in_arm = min_arm_separation(chunk['R_gc'], chunk['phi_gc'], arm_params) < arm_half_width
+        acc.add(chunk, in_arm)
+    return acc
@@ -0,0 +1,336 @@
+"""
+Spatial index over weighted sample positions for radius, box and cone queries.
+
+"How many expected stars lie within d of P" is a weighted count over the
+shell samples.  ``SpatialIndex`` bins the samples on a uniform 3-D grid and
+stores them sorted by cell, z fastest, so every run of cells along z in one
+(x, y) column is one contiguous block of samples.  With prefix sums of the
+weights and squared weights over that order, the samples of any run of cells
+sum in two lookups.  A query splits each column it touches into the cells
+it covers completely, which are summed from the prefix sums, and at most two
+boundary runs, whose samples are tested exactly.  The cost therefore grows
+with the query's surface in cells, not with the samples inside it.
+
+Radius and box queries take arrays of query points and are evaluated for
+the whole batch at once over (query, column) pairs.  Cone queries (apex,
+axis, half-angle, length) classify the cells in the cone's bounding box one
+query at a time.  Each query returns the expected count sum(w), its Monte
+Carlo standard error sqrt(sum(w^2) - sum(w)^2 / n_total) for weights
+w = rho * V / n_total, and the number of samples counted.
+
+Positions may be in any frame (Sun-centred from the pipeline samples,
+Galactocentric from the in-arm CSVs); queries use the same frame.
+``save``/``load`` keep the index as column stores (``store``) that reopen
+memory-mapped.
+"""
+
+import math
+from pathlib import Path
+
+import numpy as np
+
+from .store import load_columns, read_metadata, save_columns
+
+
+SAMPLES_PER_CELL = 32   # target mean occupancy of the occupied cells when no cell size is given
+MAX_CELLS = 1 << 24
+BATCH_PAIRS = 1 << 20   # (query, column) pairs evaluated per batch
+
+
+def _default_cell_size(x, y, z, lo, extent, rounds=3):
+    """Cell size giving about SAMPLES_PER_CELL samples per *occupied* cell.
+
+    Shell samples fill a thin sphere, so most of the bounding box is empty;
+    starting from the bounding-box estimate, each round rescales the size by
+    the cube root of (target / mean occupancy of the non-empty cells).
+    """
+    floor = extent.max() / MAX_CELLS ** (1.0/3.0)
+    n_cells = max(1, x.size // SAMPLES_PER_CELL)
+    cs = max((np.prod(extent) / n_cells) ** (1.0/3.0), floor)
+    for _ in range(rounds):
+        shape = np.maximum(np.ceil(extent / cs).astype(np.int64), 1)
+        ijk = [np.clip(((v - o) / cs).astype(np.int64), 0, n - 1) for v, o, n in zip((x, y, z), lo, shape)]
+        occupied = np.unique((ijk[0] * shape[1] + ijk[1]) * shape[2] + ijk[2]).size
+        cs = max(cs * (SAMPLES_PER_CELL * occupied / max(x.size, 1)) ** (1.0/3.0), floor)
+    return cs
+
+
+def _gather(starts, ends, owner):
+    """Sample indices in the ranges [starts, ends) and the owner of each (vectorized)."""
+    lengths = np.maximum(ends - starts, 0)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    first = np.cumsum(lengths) - lengths
+    idx = np.repeat(starts - first, lengths) + np.arange(total)
+    return idx, np.repeat(owner, lengths)
+
+
+class SpatialIndex:
+    """Samples on a uniform grid, sorted by cell, with weight prefix sums."""
+
+    def __init__(self, origin, cell_size, shape, x, y, z, w, cell_start, cum_w, cum_w2, n_total, metadata=None):
+        self.origin = np.asarray(origin, dtype=float)
+        self.cell_size = float(cell_size)
+        self.shape = tuple(int(s) for s in shape)
+        self.x, self.y, self.z, self.w = x, y, z, w
+        self.cell_start = cell_start
+        self.cum_w = cum_w
+        self.cum_w2 = cum_w2
+        self.n_total = int(n_total)
+        self.metadata = dict(metadata or {})
+
+    def __len__(self):
+        return len(self.x)
+
+    def __repr__(self):
+        return (f"<SpatialIndex {len(self):,} samples, {'x'.join(map(str, self.shape))} cells "
+                f"of {self.cell_size:g}>")
+
+    # --- building ---------------------------------------------------------
+
+    @classmethod
+    def build(cls, x, y, z, weights=None, n_total=None, cell_size=None, metadata=None):
+        """Index positions ``x, y, z`` with per-sample ``weights`` (expected stars each; default 1).
+
+        ``n_total`` is the number of samples drawn, if more than the ones
+        indexed (e.g. only the in-arm samples of a run).  ``cell_size``
+        defaults to about SAMPLES_PER_CELL samples per occupied cell.
+        """
+        x, y, z = (np.asarray(v, dtype=float) for v in (x, y, z))
+        weights = np.ones_like(x) if weights is None else np.asarray(weights, dtype=float)
+        n_total = x.size if n_total is None else n_total
+        lo = np.array([x.min(), y.min(), z.min()]) if x.size else np.zeros(3)
+        hi = np.array([x.max(), y.max(), z.max()]) if x.size else np.ones(3)
+        extent = np.maximum(hi - lo, 1e-9)
+        if cell_size is None:
+            cell_size = _default_cell_size(x, y, z, lo, extent)
+        shape = np.maximum(np.ceil(extent / cell_size).astype(np.int64), 1)
+        ijk = [np.clip(((v - o) / cell_size).astype(np.int64), 0, n - 1) for v, o, n in zip((x, y, z), lo, shape)]
+        flat = (ijk[0] * shape[1] + ijk[1]) * shape[2] + ijk[2]
+        order = np.argsort(flat, kind='stable')
+        counts = np.bincount(flat, minlength=int(np.prod(shape)))
+        cell_start = np.concatenate([[0], np.cumsum(counts)])
+        w = weights[order]
+        cum_w = np.concatenate([[0.0], np.cumsum(w)])
+        cum_w2 = np.concatenate([[0.0], np.cumsum(w * w)])
+        return cls(lo, cell_size, shape, x[order], y[order], z[order], w, cell_start, cum_w, cum_w2, n_total,
+                   metadata)
+
+    @classmethod
+    def from_samples(cls, path, in_arm_only=False, cell_size=None):
+        """Index a pipeline ``g_star_samples`` store (Sun-centred pc, w = rho * V_shell / N_mc)."""
+        meta = read_metadata(path)['metadata']
+        cols = load_columns(path)
+        n = len(cols['rho'])
+        keep = np.asarray(cols['in_arm']) if in_arm_only else slice(None)
+        z = np.asarray(cols['Z_gc'])[keep]  # z_sun == Z_gc
+        weights = np.asarray(cols['rho'])[keep] * (meta['V_shell'] / n)
+        return cls.build(np.asarray(cols['x_sun'])[keep], np.asarray(cols['y_sun'])[keep], z, weights,
+                         n_total=n, cell_size=cell_size,
+                         metadata=dict(frame='sun', source=str(path), in_arm_only=in_arm_only))
+
+    # --- persistence ------------------------------------------------------
+
+    def save(self, path):
+        path = Path(path)
+        save_columns(path / 'samples', dict(x=self.x, y=self.y, z=self.z, w=self.w),
+                     metadata=dict(origin=self.origin.tolist(), cell_size=self.cell_size, shape=list(self.shape),
+                                   n_total=self.n_total, **self.metadata))
+        save_columns(path / 'prefix', dict(w=self.cum_w, w2=self.cum_w2))
+        save_columns(path / 'cells', dict(start=self.cell_start))
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Reopen a saved index (sample arrays memory-mapped by default)."""
+        path = Path(path)
+        meta = dict(read_metadata(path / 'samples')['metadata'])
+        samples = load_columns(path / 'samples', mmap=mmap)
+        prefix = load_columns(path / 'prefix', mmap=mmap)
+        cells = load_columns(path / 'cells', mmap=False)
+        return cls(meta.pop('origin'), meta.pop('cell_size'), meta.pop('shape'), samples['x'], samples['y'],
+                   samples['z'], samples['w'], cells['start'], prefix['w'], prefix['w2'], meta.pop('n_total'), meta)
+
+    # --- query machinery ----------------------------------------------------
+
+    def _cell_range(self, lo, hi, axis):
+        """Cells [first, last] of ``axis`` overlapping [lo, hi] (clipped to the grid)."""
+        o, n = self.origin[axis], self.shape[axis]
+        first = np.clip(np.floor((lo - o) / self.cell_size), 0, n - 1).astype(np.int64)
+        last = np.clip(np.floor((hi - o) / self.cell_size), 0, n - 1).astype(np.int64)
+        return first, last
+
+    def _z_cells(self, lo, hi, inner=False):
+        """Cells of each column with z-range overlapping (``inner``: inside) [lo, hi], as [k0, k1)."""
+        o, n, cs = self.origin[2], self.shape[2], self.cell_size
+        if inner:
+            k0, k1 = np.ceil((lo - o) / cs), np.floor((hi - o) / cs)
+        else:
+            k0, k1 = np.floor((lo - o) / cs), np.floor((hi - o) / cs) + 1
+        return np.clip(k0, 0, n).astype(np.int64), np.clip(k1, 0, n).astype(np.int64)
+
+    def _columns(self, i_first, i_last, j_first, j_last):
+        """Non-empty (query, i, j) columns in each query's [i_first, i_last] x [j_first, j_last], batched."""
+        column_start = self.cell_start[::self.shape[2]]
+        occupied = column_start[1:] > column_start[:-1]
+        ni = int((i_last - i_first).max()) + 1 if i_first.size else 0
+        nj = int((j_last - j_first).max()) + 1 if i_first.size else 0
+        per_query = max(ni * nj, 1)
+        step = max(1, BATCH_PAIRS // per_query)
+        di, dj = (a.ravel() for a in np.meshgrid(np.arange(ni), np.arange(nj), indexing='ij'))
+        for start in range(0, i_first.size, step):
+            q = np.arange(start, min(start + step, i_first.size))
+            i = i_first[q, None] + di[None, :]
+            j = j_first[q, None] + dj[None, :]
+            ok = (i <= i_last[q, None]) & (j <= j_last[q, None])
+            ok[ok] = occupied[i[ok] * self.shape[1] + j[ok]]
+            yield np.broadcast_to(q[:, None], i.shape)[ok], i[ok], j[ok]
+
+    def _sum_columns(self, q, i, j, any_k, in_k, contains, n_queries):
+        """Sum the weights of runs of cells: prefix sums inside, ``contains`` test on boundary runs."""
+        k_any0, k_any1 = any_k
+        k_in0, k_in1 = in_k
+        empty = k_in1 <= k_in0
+        k_in0 = np.where(empty, k_any1, np.clip(k_in0, k_any0, k_any1))
+        k_in1 = np.where(empty, k_any1, np.clip(k_in1, k_in0, k_any1))
+        base = (i * self.shape[1] + j) * self.shape[2]
+        start = self.cell_start
+        s_in0, s_in1 = start[base + k_in0], start[base + k_in1]
+        sums = np.stack([np.bincount(q, weights=self.cum_w[s_in1] - self.cum_w[s_in0], minlength=n_queries),
+                         np.bincount(q, weights=self.cum_w2[s_in1] - self.cum_w2[s_in0], minlength=n_queries),
+                         np.bincount(q, weights=s_in1 - s_in0, minlength=n_queries)])
+        # boundary runs [k_any0, k_in0) and [k_in1, k_any1): test every sample
+        starts = np.concatenate([start[base + k_any0], s_in1])
+        ends = np.concatenate([s_in0, start[base + k_any1]])
+        idx, owner = _gather(starts, ends, np.concatenate([q, q]))
+        if idx.size:
+            hit = contains(owner, self.x[idx], self.y[idx], self.z[idx])
+            w, owner = self.w[idx[hit]], owner[hit]
+            sums[0] += np.bincount(owner, weights=w, minlength=n_queries)
+            sums[1] += np.bincount(owner, weights=w * w, minlength=n_queries)
+            sums[2] += np.bincount(owner, minlength=n_queries)
+        return sums
+
+    def _result(self, sums):
+        w, w2, n = sums
+        se = np.sqrt(np.maximum(w2 - w * w / max(self.n_total, 1), 0.0))
+        return dict(N_expected=w, N_expected_se=se, n_samples=n.astype(np.int64))
+
+    # --- queries ------------------------------------------------------------
+
+    def radius(self, centers, radius):
+        """Expected count within ``radius`` of each of the (Q, 3) ``centers`` (radius scalar or (Q,)).
+
+        Returns a dict of (Q,) arrays N_expected, N_expected_se and n_samples
+        (a single (3,) center gives scalars).
+        """
+        centers = np.asarray(centers, dtype=float)
+        single = centers.ndim == 1
+        centers = np.atleast_2d(centers)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(centers),))
+        cx, cy, cz = centers.T
+        r2 = radius * radius
+        cs = self.cell_size
+
+        def contains(q, x, y, z):
+            return (x - cx[q])**2 + (y - cy[q])**2 + (z - cz[q])**2 <= r2[q]
+
+        sums = np.zeros((3, len(centers)))
+        i_first, i_last = self._cell_range(cx - radius, cx + radius, 0)
+        j_first, j_last = self._cell_range(cy - radius, cy + radius, 1)
+        for q, i, j in self._columns(i_first, i_last, j_first, j_last):
+            x0 = self.origin[0] + i * cs
+            y0 = self.origin[1] + j * cs
+            # nearest and farthest point of the column's (x, y) square from the center
+            dx_near = np.maximum(np.maximum(x0 - cx[q], cx[q] - (x0 + cs)), 0.0)
+            dy_near = np.maximum(np.maximum(y0 - cy[q], cy[q] - (y0 + cs)), 0.0)
+            dx_far = np.maximum(np.abs(x0 - cx[q]), np.abs(x0 + cs - cx[q]))
+            dy_far = np.maximum(np.abs(y0 - cy[q]), np.abs(y0 + cs - cy[q]))
+            h_any = np.sqrt(np.maximum(r2[q] - dx_near**2 - dy_near**2, 0.0))
+            h_in = np.sqrt(np.maximum(r2[q] - dx_far**2 - dy_far**2, 0.0))
+            touches = dx_near**2 + dy_near**2 <= r2[q]
+            q, i, j, h_any, h_in, z = q[touches], i[touches], j[touches], h_any[touches], h_in[touches], cz[q][touches]
+            sums += self._sum_columns(q, i, j, self._z_cells(z - h_any, z + h_any),
+                                      self._z_cells(z - h_in, z + h_in, inner=True), contains, len(centers))
+        out = self._result(sums)
+        return {k: v[0] for k, v in out.items()} if single else out
+
+    def box(self, lower, upper):
+        """Expected count in the axis-aligned boxes [lower, upper] ((Q, 3) or (3,) corners)."""
+        lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+        single = lower.ndim == 1
+        lower, upper = np.atleast_2d(lower), np.atleast_2d(upper)
+        cs = self.cell_size
+
+        def contains(q, x, y, z):
+            p = (x, y, z)
+            return np.all([(p[a] >= lower[q, a]) & (p[a] <= upper[q, a]) for a in range(3)], axis=0)
+
+        sums = np.zeros((3, len(lower)))
+        i_first, i_last = self._cell_range(lower[:, 0], upper[:, 0], 0)
+        j_first, j_last = self._cell_range(lower[:, 1], upper[:, 1], 1)
+        for q, i, j in self._columns(i_first, i_last, j_first, j_last):
+            x0 = self.origin[0] + i * cs
+            y0 = self.origin[1] + j * cs
+            # columns wholly inside the box in (x, y) count their inner z cells from the prefix sums
+            inside = ((x0 >= lower[q, 0]) & (x0 + cs <= upper[q, 0]) &
+                      (y0 >= lower[q, 1]) & (y0 + cs <= upper[q, 1]))
+            k_in0, k_in1 = self._z_cells(lower[q, 2], upper[q, 2], inner=True)
+            sums += self._sum_columns(q, i, j, self._z_cells(lower[q, 2], upper[q, 2]),
+                                      (k_in0, np.where(inside, k_in1, k_in0)), contains, len(lower))
+        out = self._result(sums)
+        return {k: v[0] for k, v in out.items()} if single else out
+
+    def cone(self, apex, axis, half_angle_deg, length):
+        """Expected count within ``length`` of ``apex`` and ``half_angle_deg`` of direction ``axis``.
+
+        One query per call (``apex``, ``axis`` of shape (3,)); loop for several.
+        """
+        apex = np.asarray(apex, dtype=float)
+        u = np.asarray(axis, dtype=float)
+        u = u / np.linalg.norm(u)
+        alpha = math.radians(half_angle_deg)
+        cos_a = math.cos(alpha)
+        cs = self.cell_size
+
+        def contains(q, x, y, z):
+            v = np.stack([x - apex[0], y - apex[1], z - apex[2]])
+            r = np.sqrt((v * v).sum(axis=0))
+            return (r <= length) & (u @ v >= r * cos_a)
+
+        # bounding box of the spherical sector: +-length along axes inside the cone, else its rim
+        lo, hi = apex.copy(), apex.copy()
+        for a in range(3):
+            for sign, bound in ((1.0, hi), (-1.0, lo)):
+                along = sign * u[a]
+                if along >= cos_a:
+                    reach = length
+                else:
+                    reach = length * (cos_a * along + math.sin(alpha) * math.sqrt(max(1.0 - along**2, 0.0)))
+                bound[a] += sign * max(reach, 0.0)
+        ranges = [self._cell_range(lo[a], hi[a], a) for a in range(3)]
+        i, j, k = (g.ravel() for g in np.meshgrid(*[np.arange(f, l + 1) for f, l in ranges], indexing='ij'))
+
+        # classify each candidate cell by its bounding sphere
+        center = self.origin + (np.stack([i, j, k], axis=1) + 0.5) * cs
+        v = center - apex
+        r = np.sqrt((v * v).sum(axis=1))
+        h = 0.5 * math.sqrt(3.0) * cs
+        with np.errstate(invalid='ignore', divide='ignore'):
+            angle = np.arccos(np.clip(v @ u / r, -1.0, 1.0))
+            spread = np.arcsin(np.clip(h / r, 0.0, 1.0))
+        inside = (r > h) & (r + h <= length) & (angle + spread <= alpha)
+        outside = (r - h > length) | ((r > h) & (angle - spread > alpha))
+        flat = (i * self.shape[1] + j) * self.shape[2] + k
+        start = self.cell_start
+        s0, s1 = start[flat[inside]], start[flat[inside] + 1]
+        sums = np.array([[(self.cum_w[s1] - self.cum_w[s0]).sum()], [(self.cum_w2[s1] - self.cum_w2[s0]).sum()],
+                         [(s1 - s0).sum()]], dtype=float)
+        edge = flat[~inside & ~outside]
+        idx, owner = _gather(start[edge], start[edge + 1], np.zeros(edge.size, dtype=np.int64))
+        if idx.size:
+            hit = contains(owner, self.x[idx], self.y[idx], self.z[idx])
+            w = self.w[idx[hit]]
+            sums[:, 0] += (w.sum(), (w * w).sum(), hit.sum())
+        return {key: value[0] for key, value in self._result(sums).items()}
@@ -0,0 +1,167 @@
+"""
+Spiral-arm membership for Monte Carlo sample points.
+
+Each arm is a logarithmic spiral in the Reid et al. (2014) style used by the
+notebooks:
+
+    R_arm(phi) = R_ref * exp( wrap(phi - phi_ref) * tan(pitch) )
+
+with wrap() mapping the azimuth offset into [-pi, pi).  A point at
+Galactocentric (R_gc, phi_gc) is in an arm when the smallest radial separation
+|R_gc - R_arm(phi_gc + delta)| over a small azimuth window delta in
+[-phi_window_half, +phi_window_half] is below the arm half-width.
+
+The notebooks used to evaluate that window as an (N_mc, n_phi_samples)
+broadcast per arm (~1 GB of float64 temporaries at N_mc=1M).  Here the minimum
+is solved analytically instead: R_arm is monotonic in delta on each unwrapped
+piece of the window, so the best offset is the one where R_arm == R_gc,
+snapped to the neighbouring window samples.  Points are processed in fixed-size
+chunks so peak memory is O(chunk_size) regardless of N_mc.
+"""
+
+import csv
+import math
+from pathlib import Path
+
+import numpy as np
+
+
+# Defaults matching g_star_spiral_model.ipynb
+PHI_WINDOW_HALF = math.radians(6.0)
+N_PHI_SAMPLES = 121
+CHUNK_SIZE = 1 << 18
+
+
+def load_arm_params(csv_path):
+    """Load arms from a reid_arms.csv style file (name,R_ref_pc,phi_ref_deg,pitch_deg).
+
+    A header row is optional; rows that do not parse as numbers are skipped.
+    Angles are returned in radians.
+    """
+    arm_params = []
+    with Path(csv_path).open('r', newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if len(row) < 4:
+                continue
+            try:
+                R_ref = float(row[1])
+                phi_ref = math.radians(float(row[2]))
+                pitch = math.radians(float(row[3]))
+            except ValueError:
+                continue
+            arm_params.append(dict(name=row[0], R_ref=R_ref, phi_ref=phi_ref, pitch=pitch))
+    return arm_params
+
+
+def parametric_arms(n_arms=4, pitch_deg=12.0, R_ref=8122.0, phi0=0.0):
+    """Evenly spaced fallback arms used when reid_arms.csv is not available."""
+    pitch = math.radians(pitch_deg)
+    return [
+        dict(name=f'arm{k+1}', R_ref=R_ref, phi_ref=phi0 + k * (2.0*math.pi / n_arms), pitch=pitch)
+        for k in range(n_arms)
+    ]
+
+
+def _arm_separation_chunk(R_gc, phi_gc, arm, phi_window_half, n_phi_samples, dtype):
+    """Minimum |R_gc - R_arm| over the azimuth window for one arm and one chunk."""
+    two_pi = 2.0 * math.pi
+    tan_p = math.tan(arm['pitch'])
+    R_ref = arm['R_ref']
+
+    # wrapped phi_rel at the start of the window; the window is then unwrapped
+    # as a_start + delta, with a single possible wrap back by 2*pi where it
+    # crosses +pi (the window is much narrower than one winding).
+    a_start = np.mod(phi_gc - arm['phi_ref'] - phi_window_half + math.pi, two_pi) - math.pi
+    width = 2.0 * phi_window_half
+    # phi_rel at which the spiral passes exactly through R_gc
+    with np.errstate(divide='ignore'):
+        u_hit = np.log(R_gc / R_ref) / tan_p
+
+    if n_phi_samples is None:
+        # continuous window: clip the exact solution into each unwrapped piece
+        d_break = np.minimum(math.pi - a_start, width)
+        d1 = np.clip(u_hit - a_start, 0.0, d_break)
+        best = np.abs(R_gc - R_ref * np.exp((a_start + d1) * tan_p))
+        wraps = d_break < width
+        if np.any(wraps):
+            d2 = np.clip(u_hit + two_pi - a_start, d_break, width)
+            sep2 = np.abs(R_gc - R_ref * np.exp((a_start + d2 - two_pi) * tan_p))
+            best = np.where(wraps, np.minimum(best, sep2), best)
+        return best.astype(dtype, copy=False)
+
+    if n_phi_samples == 1:
+        # np.linspace(-phi_window_half, phi_window_half, 1) is the window start alone
+        return np.abs(R_gc - R_ref * np.exp(a_start * tan_p)).astype(dtype, copy=False)
+
+    # discrete window: samples at a_start + j*h for j = 0..n-1, matching
+    # np.linspace(-phi_window_half, phi_window_half, n_phi_samples)
+    h = width / (n_phi_samples - 1)
+    last = n_phi_samples - 1
+    # first sample index that lies past +pi (belongs to the wrapped piece)
+    j_break = np.clip(np.ceil((math.pi - a_start) / h), 0, n_phi_samples).astype(np.int64)
+
+    best = np.full(R_gc.shape, np.inf, dtype=dtype)
+    for shift, lo, hi in ((0.0, 0, j_break - 1), (two_pi, j_break, last)):
+        valid = lo <= hi
+        if not np.any(valid):
+            continue
+        j_hit = (u_hit + shift - a_start) / h
+        for j in (np.floor(j_hit), np.ceil(j_hit)):
+            j = np.clip(j, lo, np.maximum(hi, lo))
+            phi_rel = a_start + j * h - shift
+            sep = np.abs(R_gc - R_ref * np.exp(phi_rel * tan_p)).astype(dtype, copy=False)
+            best = np.where(valid, np.minimum(best, sep), best)
+    return best
+
+
+def min_arm_separation(R_gc, phi_gc, arm_params, phi_window_half=PHI_WINDOW_HALF,
+                       n_phi_samples=N_PHI_SAMPLES, chunk_size=CHUNK_SIZE, dtype=np.float32):
+    """Minimum radial separation (pc) of each point from any arm in ``arm_params``.
+
+    Reproduces the notebook's phi-window search: with ``n_phi_samples`` set,
+    the minimum is taken over the same evenly spaced window samples; with
+    ``n_phi_samples=None`` it is the exact minimum over the continuous window.
+    A single sample sits at ``-phi_window_half``, as ``np.linspace`` puts it.
+
+    ``R_gc`` and ``phi_gc`` are 1-D arrays (pc, radians), processed
+    ``chunk_size`` points at a time.  The window geometry and the
+    angle-to-radius step R_ref * exp(phi_rel * tan(pitch)) are always
+    evaluated in float64, since a float32 angle error is magnified by R ~ 10 kpc
+    into parsec-level radius errors.  Only the returned separations are stored
+    in ``dtype``; float32 (the default) keeps them to ~7 significant digits,
+    ~1e-3 pc at a 10 kpc separation.
+    """
+    if n_phi_samples is not None and n_phi_samples < 1:
+        raise ValueError(f"n_phi_samples must be at least 1 (or None for the continuous window), got {n_phi_samples}")
+    R_gc = np.asarray(R_gc)
+    phi_gc = np.asarray(phi_gc)
+    sep_min = np.full(R_gc.shape, np.inf, dtype=dtype)
+    for start in range(0, R_gc.size, chunk_size):
+        sl = slice(start, start + chunk_size)
+        R_chunk = R_gc[sl].astype(np.float64, copy=False)
+        phi_chunk = phi_gc[sl].astype(np.float64, copy=False)
+        for arm in arm_params:
+            sep = _arm_separation_chunk(R_chunk, phi_chunk, arm, phi_window_half, n_phi_samples, dtype)
+            np.minimum(sep_min[sl], sep, out=sep_min[sl])
+    return sep_min
+
+
+def in_arm_mask(R_gc, phi_gc, arm_params, arm_half_width, **kwargs):
+    """Boolean mask of points lying within ``arm_half_width`` (pc) of an arm."""
+    return min_arm_separation(R_gc, phi_gc, arm_params, **kwargs) < arm_half_width
+
+
+def arm_polylines(arm_params, R0_pc, n_points=2000):
+    """Sun-centred loci of every arm for plot overlays: ``[(name, x, y), ...]`` in pc.
+
+    The curve the notebooks drew for each figure: R_arm(phi) for phi over
+    [-pi, pi], shifted by -R0 along x.  Compute it once per run and reuse it
+    for every overlay.
+    """
+    phi = np.linspace(-math.pi, math.pi, n_points)
+    lines = []
+    for arm in arm_params:
+        phi_rel = (phi - arm['phi_ref'] + math.pi) % (2.0*math.pi) - math.pi
+        R_arm = arm['R_ref'] * np.exp(phi_rel * math.tan(arm['pitch']))
+        lines.append((arm.get('name', 'arm'), R_arm * np.cos(phi) - R0_pc, R_arm * np.sin(phi)))
+    return lines
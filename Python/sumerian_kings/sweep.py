@@ -0,0 +1,91 @@
+"""
+Disk and arm parameter sweeps by reweighting one set of shell samples.
+
+The sample positions do not depend on the disk or arm parameters: only the
+weights do.  With the per-sample geometry (R_gc, |Z_gc|, sep_min) computed
+once, the expected in-arm count for any (N_total, Rd, hz, arm_half_width) is
+
+    N_arms = V_shell/N_mc * sum_i sigma0(N_total, Rd)/(2 hz)
+             * exp(-R_i/Rd) * exp(-|Z_i|/hz) * [sep_i < arm_half_width]
+
+* N_total enters linearly through sigma0, so it is a final outer product;
+* for every (Rd, hz) pair the sum over samples is a matrix product
+  exp(-R/Rd)^T @ exp(-|Z|/hz);
+* sorting samples into arm-width bands (searchsorted on sep_min) makes the
+  in-arm sums for all widths a cumulative sum over the bands.
+
+So a 4-D grid of thousands of configurations costs about one
+(N_mc x n_Rd) @ (N_mc x n_hz) product, instead of one arm-separation search
+per configuration.
+"""
+
+import numpy as np
+
+from .labelled import LabelledGrid
+from .shell import CHUNK_SIZE, compute_sigma0, iter_shell_chunks, shell_volume
+from .spiral_arms import min_arm_separation
+
+
+def shell_geometry(N_mc, r1, r2, R0_pc, arm_params, seed=None, chunk_size=CHUNK_SIZE):
+    """Per-sample R_gc, |Z_gc| and sep_min for ``N_mc`` uniform shell points (computed once)."""
+    parts = dict(R_gc=[], abs_Z=[], sep_min=[])
+    # density parameters are irrelevant here: only positions are kept
+    for chunk in iter_shell_chunks(N_mc, r1, r2, R0_pc, 0.0, 1.0, 1.0, seed=seed, chunk_size=chunk_size):
+        parts['R_gc'].append(chunk['R_gc'])
+        parts['abs_Z'].append(np.abs(chunk['Z_gc']))
+        parts['sep_min'].append(min_arm_separation(chunk['R_gc'], chunk['phi_gc'], arm_params))
+    geometry = {k: np.concatenate(v) for k, v in parts.items()}
+    geometry['V_shell'] = shell_volume(r1, r2)
+    return geometry
+
+
+def sweep_shell_parameters(R_gc, abs_Z, sep_min, V_shell, N_total, Rd, hz, arm_half_width, Rmax,
+                           chunk_size=CHUNK_SIZE):
+    """Expected shell / in-arm counts on the (N_total, Rd, hz, arm_half_width) grid.
+
+    Returns a ``LabelledGrid`` with N_expected_arms, N_expected_shell and
+    frac_points_in_arm (the latter two broadcast over the dimensions they do
+    not depend on).
+    """
+    N_total, Rd, hz, widths = (np.atleast_1d(np.asarray(v, dtype=float)) for v in (N_total, Rd, hz, arm_half_width))
+    order = np.argsort(widths)
+    widths_sorted = widths[order]
+    n_bands = widths.size + 1  # last band: outside every arm width
+    n_mc = R_gc.size
+
+    # band_sums[k] = sum over samples in band k of exp(-R/Rd) exp(-|Z|/hz), shape (n_Rd, n_hz)
+    band_sums = np.zeros((n_bands, Rd.size, hz.size))
+    band_counts = np.zeros(n_bands, dtype=np.int64)
+    for start in range(0, n_mc, chunk_size):
+        sl = slice(start, start + chunk_size)
+        band = np.searchsorted(widths_sorted, sep_min[sl], side='right')  # in arm for widths[j] iff j >= band
+        E_R = np.exp(-R_gc[sl, None] / Rd[None, :])
+        E_Z = np.exp(-abs_Z[sl, None] / hz[None, :])
+        band_order = np.argsort(band, kind='stable')
+        counts = np.bincount(band, minlength=n_bands)
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        for k in np.flatnonzero(counts):
+            idx = band_order[bounds[k]:bounds[k + 1]]
+            band_sums[k] += E_R[idx].T @ E_Z[idx]
+        band_counts += counts
+
+    arm_sums = np.cumsum(band_sums[:-1], axis=0)  # (n_widths sorted, n_Rd, n_hz)
+    arm_sums[order] = arm_sums.copy()  # back to the caller's width order
+    shell_sums = band_sums.sum(axis=0)
+    frac = np.empty(widths.size)
+    frac[order] = np.cumsum(band_counts[:-1]) / n_mc
+
+    sigma0_per_star = np.array([compute_sigma0(1.0, rd, Rmax) for rd in Rd])
+    # (n_Rd, n_hz) factor V/N_mc * sigma0/(2 hz) per unit N_total
+    scale = V_shell / n_mc * sigma0_per_star[:, None] / (2.0 * hz[None, :])
+    N_arms = N_total[:, None, None, None] * (scale * arm_sums).transpose(1, 2, 0)[None]
+    N_shell = N_total[:, None, None] * (scale * shell_sums)[None]
+    shape = (N_total.size, Rd.size, hz.size, widths.size)
+
+    return LabelledGrid(
+        dict(N_total_G=N_total, Rd=Rd, hz=hz, arm_half_width=widths),
+        dict(N_expected_arms=N_arms,
+             N_expected_shell=np.broadcast_to(N_shell[..., None], shape),
+             frac_points_in_arm=np.broadcast_to(frac, shape)),
+        attrs=dict(V_shell=V_shell, N_mc=n_mc, Rmax=Rmax),
+    )
@@ -0,0 +1,183 @@
+"""
+Per-stage timing and resource telemetry for result provenance.
+
+A ``Telemetry`` wraps the compute stages of a run (sampling, arm membership,
+density weighting, histogramming, quantiles, plotting, file I/O):
+
+    tel = Telemetry()
+    with tel.stage('arm_membership', samples=n):
+        in_arm = in_arm_mask(R_gc, phi_gc, arm_params, arm_half_width)
+    for chunk in tel.iterate('sampling', iter_shell_chunks(...), samples=lambda c: c['rho'].size):
+        ...
+    result['provenance'] = tel.provenance(notebook='g_star_spiral_model.ipynb')
+
+Entering a stage again (e.g. once per chunk) accumulates into the same
+record: calls, wall time, CPU time, samples and throughput, plus the process
+peak RSS at the end of the stage and how much the stage raised it.  Stages
+may nest; their times are inclusive.  ``provenance()`` returns the
+timestamp / git commit / version block with everything under
+``performance``.
+
+Setting the environment variable ``SUMERIAN_KINGS_PROFILE`` to a directory
+also runs each stage under cProfile; the profiles are written as
+``<label>.<stage>.prof`` there when ``report()`` / ``provenance()`` is
+called, or by ``dump_profiles()`` (read with ``python -m pstats``).  ``format_report`` prints the stages as a
+table, slowest first.
+"""
+
+import cProfile
+import os
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from . import __version__
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not recorded
+    resource = None
+
+
+PROFILE_ENV = 'SUMERIAN_KINGS_PROFILE'
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if platform.system() == 'Darwin' else peak / 2**10
+
+
+def git_commit(cwd=None):
+    """Short hash of the checked-out commit, or None outside a git checkout."""
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, capture_output=True,
+                             text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def machine_key():
+    """Identifies the host so throughput is compared across like machines."""
+    return f"{platform.node()}/{platform.machine()}/{os.cpu_count()}cpu/py{platform.python_version()}"
+
+
+class Telemetry:
+    """Accumulates wall / CPU time, samples and peak memory per named stage."""
+
+    def __init__(self, label='run', profile_dir=None):
+        self.label = label
+        self.stages = {}
+        profile_dir = profile_dir or os.environ.get(PROFILE_ENV)
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self._profiles = {}
+        self._profiling = False
+        self._git_commit = None  # looked up once, on the first provenance()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+
+    @contextmanager
+    def stage(self, name, samples=0):
+        """Time the body as stage ``name``; the yielded record's ``samples`` may be updated inside."""
+        rec = self.stages.setdefault(name, dict(calls=0, wall_s=0.0, cpu_s=0.0, samples=0,
+                                                peak_rss_mb=None, rss_growth_mb=0.0))
+        rec['calls'] += 1
+        rec['samples'] += samples
+        profile = self._start_profile(name)
+        rss0 = peak_rss_mb()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield rec
+        finally:
+            rec['wall_s'] += time.perf_counter() - wall0
+            rec['cpu_s'] += time.process_time() - cpu0
+            rss1 = peak_rss_mb()
+            if rss1 is not None:
+                rec['peak_rss_mb'] = rss1
+                rec['rss_growth_mb'] += rss1 - rss0
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+
+    def iterate(self, name, iterable, samples=None):
+        """Yield from ``iterable``, timing each ``next`` as stage ``name``.
+
+        ``samples(item)`` gives the number of samples in each item (e.g. a chunk).
+        """
+        it = iter(iterable)
+        while True:
+            with self.stage(name) as rec:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    rec['calls'] -= 1
+                    return
+                if samples is not None:
+                    rec['samples'] += samples(item)
+            yield item
+
+    def _profile_path(self, name):
+        return self.profile_dir / f'{self.label}.{name}.prof'
+
+    def _start_profile(self, name):
+        # one profiler may be active at a time: nested stages count towards the outer one
+        if self.profile_dir is None or self._profiling:
+            return None
+        profile = self._profiles.get(name)
+        if profile is None:
+            profile = self._profiles[name] = cProfile.Profile()
+        self._profiling = True
+        profile.enable()
+        return profile
+
+    def dump_profiles(self):
+        """Write each stage's accumulated profile; returns ``{stage: path}``."""
+        if not self._profiles:
+            return {}
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        paths = {}
+        for name, profile in self._profiles.items():
+            paths[name] = str(self._profile_path(name))
+            profile.dump_stats(paths[name])
+        return paths
+
+    def report(self):
+        """``{stages: {...}, wall_s, cpu_s, peak_rss_mb, machine, ...}`` for result JSONs."""
+        stages = {}
+        for name, rec in self.stages.items():
+            rec = dict(rec)
+            rec['samples_per_s'] = rec['samples'] / rec['wall_s'] if rec['samples'] and rec['wall_s'] > 0 else None
+            stages[name] = rec
+        out = dict(stages=stages, wall_s=time.perf_counter() - self._wall0, cpu_s=time.process_time() - self._cpu0,
+                   peak_rss_mb=peak_rss_mb(), machine=machine_key(), numpy=np.__version__)
+        if self.profile_dir is not None:
+            out['profiles'] = self.dump_profiles()
+        return out
+
+    def provenance(self, **extra):
+        """Timestamp, git commit, package version and the ``performance`` report."""
+        if self._git_commit is None:
+            self._git_commit = git_commit(Path(__file__).parent) or ''
+        return dict(timestamp_utc=datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    git_commit_short=self._git_commit or None, package_version=__version__,
+                    **extra, performance=self.report())
+
+
+def format_report(report):
+    """Text table of a ``report()`` (or ``provenance['performance']``), slowest stage first."""
+    lines = [f"{'stage':24s} {'calls':>6s} {'wall s':>9s} {'cpu s':>9s} {'samples/s':>11s} {'peak MiB':>9s}"]
+    for name, rec in sorted(report['stages'].items(), key=lambda item: -item[1]['wall_s']):
+        rate = f"{rec['samples_per_s']:11.4g}" if rec['samples_per_s'] else f"{'-':>11s}"
+        rss = f"{rec['peak_rss_mb']:9.1f}" if rec['peak_rss_mb'] is not None else f"{'-':>9s}"
+        lines.append(f"{name:24s} {rec['calls']:6d} {rec['wall_s']:9.3f} {rec['cpu_s']:9.3f} {rate} {rss}")
+    lines.append(f"{'total':24s} {'':6s} {report['wall_s']:9.3f} {report['cpu_s']:9.3f}")
+    return '\n'.join(lines)
@@ -0,0 +1,125 @@
+"""
+Closed-form P(>=1) threshold boundaries for the Drake (f_l, f_i) plane.
+
+P(>=1) = 1 - (1 - p)^N_stars depends on the factors only through the per-star
+probability p = fp*ne*f_l*f_i*f_c*L/t_star, and is increasing in p.  So for a
+threshold t the region P(>=1) >= t is p >= p_t with
+
+    p_t = 1 - (1 - t)^(1/N_stars),
+
+which in (x, y) = (log10 f_l, log10 f_i) is the half-plane x + y >= s with
+
+    s = log10( p_t * t_star / (fp * ne * f_c * L) ).
+
+The boundary is a straight line, and the fraction of the log-space box
+[x0, x1] x [y0, y1] above it has a closed form, so thresholds, contours and
+area fractions need no grid, CSV round-trip or contour scraping.
+"""
+
+import numpy as np
+
+from .drake import FP, NE, T_STAR_G
+
+
+LOG10_FL_RANGE = (-6.0, 0.0)
+LOG10_FI_RANGE = (-6.0, 0.0)
+
+
+def per_star_threshold(t, N_stars):
+    """Per-star probability p_t at which P(>=1) among N_stars equals t."""
+    with np.errstate(divide='ignore'):  # t = 1 gives p_t = 1
+        return -np.expm1(np.log1p(-np.asarray(t, dtype=float)) / N_stars)
+
+
+def p_any_from_p(p, N_stars):
+    """P(>=1) for per-star probability p (inverse of ``per_star_threshold``)."""
+    return -np.expm1(N_stars * np.log1p(-np.asarray(p, dtype=float)))
+
+
+def boundary_offset(t, N_stars, L, f_c, fp=FP, ne=NE, t_star=T_STAR_G):
+    """Offset s of the boundary line log10(f_l) + log10(f_i) = s (broadcasts over t, L)."""
+    return np.log10(per_star_threshold(t, N_stars) * t_star / (fp * ne * f_c * np.asarray(L, dtype=float)))
+
+
+def _area_below(u, w, h):
+    """Area of {a + b <= u} inside [0, w] x [0, h]."""
+    def g(v):
+        return 0.5 * np.maximum(v, 0.0) ** 2
+    return g(u) - g(u - w) - g(u - h) + g(u - w - h)
+
+
+def area_fraction(s, x_range=LOG10_FL_RANGE, y_range=LOG10_FI_RANGE):
+    """Exact fraction of the log-space box where x + y >= s."""
+    (x0, x1), (y0, y1) = x_range, y_range
+    w, h = x1 - x0, y1 - y0
+    below = _area_below(np.asarray(s, dtype=float) - x0 - y0, w, h) / (w * h)
+    return np.clip(1.0 - below, 0.0, 1.0)
+
+
+def offset_for_area_fraction(frac, x_range=LOG10_FL_RANGE, y_range=LOG10_FI_RANGE):
+    """Inverse of ``area_fraction``: the s whose half-plane covers ``frac`` of the box."""
+    (x0, x1), (y0, y1) = x_range, y_range
+    w, h = sorted((x1 - x0, y1 - y0))
+    below = (1.0 - np.asarray(frac, dtype=float)) * w * h
+    # piecewise inverse of the triangle / band / triangle area profile
+    u = np.where(
+        below <= 0.5 * w * w,
+        np.sqrt(2.0 * below),
+        np.where(below <= w * h - 0.5 * w * w,
+                 below / w + 0.5 * w,
+                 w + h - np.sqrt(np.maximum(2.0 * (w * h - below), 0.0))),
+    )
+    return u + x0 + y0
+
+
+def boundary_segment(s, x_range=LOG10_FL_RANGE, y_range=LOG10_FI_RANGE):
+    """End points ((x_a, y_a), (x_b, y_b)) of x + y = s clipped to the box, or None."""
+    (x0, x1), (y0, y1) = x_range, y_range
+    xa, xb = max(x0, s - y1), min(x1, s - y0)
+    if xa > xb:
+        return None
+    return (xa, s - xa), (xb, s - xb)
+
+
+def threshold_boundaries(thresholds, L_values, N_stars, f_c, fp=FP, ne=NE, t_star=T_STAR_G,
+                         x_range=LOG10_FL_RANGE, y_range=LOG10_FI_RANGE):
+    """Boundary vertices and area fractions for every (L, threshold) pair.
+
+    Returns ``(boundary_rows, summary)`` in the layout of g_drake_thresholds.csv
+    (L, threshold, log10_fl, log10_fi; two vertices per straight boundary) and
+    g_drake_threshold_summary.json ({L: {threshold: {'area_fraction': ...}}}).
+    """
+    s = boundary_offset(np.asarray(thresholds)[None, :], N_stars, np.asarray(L_values)[:, None],
+                        f_c, fp=fp, ne=ne, t_star=t_star)
+    frac = area_fraction(s, x_range, y_range)
+    boundary_rows = []
+    summary = {}
+    for i, L in enumerate(L_values):
+        summary_L = {}
+        for j, t in enumerate(thresholds):
+            summary_L[str(t)] = {'area_fraction': float(frac[i, j])}
+            seg = boundary_segment(float(s[i, j]), x_range, y_range)
+            for x, y in seg or ():
+                boundary_rows.append({'L': int(L), 'threshold': float(t), 'log10_fl': x, 'log10_fi': y})
+        summary[str(int(L))] = summary_L
+    return boundary_rows, summary
+
+
+def threshold_table(area_fraction_targets, L_values, N_stars, f_c, fp=FP, ne=NE, t_star=T_STAR_G,
+                    x_range=LOG10_FL_RANGE, y_range=LOG10_FI_RANGE):
+    """For each L and target area fraction, the P(>=1) threshold covering exactly that fraction.
+
+    Rows match g_drake_threshold_table.csv (L, area_fraction_target,
+    threshold_p_any, observed_area_fraction).
+    """
+    targets = np.asarray(area_fraction_targets, dtype=float)
+    s = offset_for_area_fraction(targets, x_range, y_range)
+    rows = []
+    for L in L_values:
+        p = fp * ne * f_c * (L / t_star) * 10.0 ** s
+        t = p_any_from_p(np.minimum(p, 1.0 - 1e-16), N_stars)
+        observed = area_fraction(boundary_offset(t, N_stars, L, f_c, fp=fp, ne=ne, t_star=t_star), x_range, y_range)
+        for af, thr, obs in zip(targets, t, observed):
+            rows.append({'L': int(L), 'area_fraction_target': float(af),
+                         'threshold_p_any': float(thr), 'observed_area_fraction': float(obs)})
+    return rows
@@ -0,0 +1,158 @@
+"""
+Random-walk Monte Carlo of the kings' voyage.
+
+The kings notebook turns each king's mean speed into one step,
+b_mean * reign light years, and estimates the net displacement from Earth as
+sqrt(sum(step**2)).  Here every walker makes the whole voyage: each king
+draws his own speed b from the truncated speed interval of ``kings`` (the
+same inverse transform as ``kings.sample_speeds``) and flies b * reign light
+years (Earth time, c = 1) in an isotropic direction.  Walkers are processed
+as (rows, n_kings) arrays in chunks of about ``chunk_size`` steps.  The x, y
+and z sums over kings are reduced one component at a time, which gives the
+same result as the full (rows, n_kings, 3) step array in a third of the
+memory.  The steps are drawn in float32 and summed per walker in float64.
+
+``VoyageAccumulator`` keeps the moments, a fixed-edge histogram and a
+``QuantileSketch`` of the net displacement and of the path length, so
+partial runs (chunks, workers, separate seeds) merge exactly like the other
+accumulators and ``parallel.parallel_voyages`` spreads tens of millions of
+walkers over a process pool.  ``displacement_shells`` turns displacement
+quantiles into (r1_ly, r2_ly) shells for the star-count model.
+"""
+
+import math
+
+import numpy as np
+
+from .kings import LOWER_AGE, UPPER_AGE, speed_interval
+from .sketch import QuantileSketch
+
+
+CHUNK_SIZE = 1 << 20  # steps (walkers x kings) per chunk
+N_BINS = 1000
+QUANTILES = (0.01, 0.05, 0.16, 0.25, 0.5, 0.75, 0.84, 0.95, 0.99)
+SHELL_WIDTH_LY = 20.0  # thickness of the g_star_spiral_model shell
+
+
+def voyage_streams(seed):
+    """Independent Generators for speed, cos(theta) and phi spawned from ``seed``."""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(s) for s in seed.spawn(3)]
+
+
+def max_displacement(reigns, lower_age=LOWER_AGE, upper_age=UPPER_AGE):
+    """Longest possible voyage (ly): every king at his fastest, all in one direction."""
+    _, b_hi = speed_interval(reigns, lower_age, upper_age)
+    return float(np.nansum(b_hi * np.asarray(reigns, dtype=float)))
+
+
+def iter_voyage_chunks(n_walkers, reigns, seed=None, lower_age=LOWER_AGE, upper_age=UPPER_AGE,
+                       chunk_size=CHUNK_SIZE):
+    """Yield ``(displacement, path_length)`` arrays (ly) for ``n_walkers`` walkers, chunk by chunk.
+
+    Kings without a valid speed (reign below ``lower_age``) make no step, as
+    the notebook's ``np.nansum`` does.
+    """
+    reigns = np.asarray(reigns, dtype=float)
+    b_lo, b_hi = speed_interval(reigns, lower_age, upper_age)
+    valid = ~np.isnan(b_lo)
+    # per-step arrays in float32 (about twice as fast to draw and rotate); per-walker sums in float64
+    reigns, b_lo, span = (a[valid].astype(np.float32) for a in (reigns, b_lo, b_hi - b_lo))
+    n_kings = reigns.size
+    rng_b, rng_cos, rng_phi = voyage_streams(seed)
+    rows = max(1, chunk_size // max(n_kings, 1))
+    for start in range(0, n_walkers, rows):
+        n = min(rows, n_walkers - start)
+        step = rng_b.random((n, n_kings), dtype=np.float32)
+        step *= span
+        step += b_lo
+        step *= reigns  # ly, shape (n, n_kings)
+        cos_theta = rng_cos.random((n, n_kings), dtype=np.float32)
+        cos_theta *= 2.0
+        cos_theta -= 1.0
+        phi = rng_phi.random((n, n_kings), dtype=np.float32)
+        phi *= np.float32(2.0*math.pi)
+        path = step.sum(axis=1, dtype=np.float64)
+        z = np.einsum('ij,ij->i', step, cos_theta, dtype=np.float64)
+        step *= np.sqrt(1.0 - cos_theta**2)  # in-plane part of each step
+        x = np.einsum('ij,ij->i', step, np.cos(phi), dtype=np.float64)
+        y = np.einsum('ij,ij->i', step, np.sin(phi, out=phi), dtype=np.float64)
+        yield np.sqrt(x*x + y*y + z*z), path
+
+
+class VoyageAccumulator:
+    """Mergeable sums, histograms on [0, max_ly] and quantile sketches of displacement and path length."""
+
+    keys = ('displacement', 'path_length')
+
+    def __init__(self, max_ly, n_bins=N_BINS):
+        self.edges = np.linspace(0.0, max_ly, n_bins + 1)
+        self.n = 0
+        self.sums = dict.fromkeys(self.keys, 0.0)
+        self.sums2 = dict.fromkeys(self.keys, 0.0)
+        self.hists = {k: np.zeros(n_bins, dtype=np.int64) for k in self.keys}
+        self.sketches = {k: QuantileSketch() for k in self.keys}
+
+    def add(self, displacement, path_length):
+        n_bins = self.edges.size - 1
+        scale = n_bins / self.edges[-1] if self.edges[-1] > 0 else 0.0
+        self.n += displacement.size
+        for k, x in zip(self.keys, (displacement, path_length)):
+            self.sums[k] += float(np.sum(x))
+            self.sums2[k] += float(np.dot(x, x))
+            # uniform edges: the bin index is a multiply, no search needed
+            idx = np.minimum((x * scale).astype(np.int64), n_bins - 1)
+            self.hists[k] += np.bincount(idx, minlength=n_bins)
+            self.sketches[k].update(x)
+        return self
+
+    def merge(self, other):
+        self.n += other.n
+        for k in self.keys:
+            self.sums[k] += other.sums[k]
+            self.sums2[k] += other.sums2[k]
+            self.hists[k] += other.hists[k]
+            self.sketches[k].merge(other.sketches[k])
+        return self
+
+    def quantile(self, q, key='displacement'):
+        return self.sketches[key].quantile(q)
+
+    def result(self, quantiles=QUANTILES, include_hists=True):
+        """Means, standard deviations, RMS, medians and quantiles (ly) of displacement and path length."""
+        out = {'n_walkers': self.n, 'quantile_levels': list(quantiles)}
+        for k in self.keys:
+            mean = self.sums[k] / self.n
+            mean2 = self.sums2[k] / self.n
+            out[f'{k}_mean_ly'] = mean
+            out[f'{k}_std_ly'] = math.sqrt(max(mean2 - mean**2, 0.0))
+            out[f'{k}_rms_ly'] = math.sqrt(mean2)
+            out[f'{k}_median_ly'] = float(self.sketches[k].quantile(0.5))
+            out[f'{k}_quantiles_ly'] = self.sketches[k].quantile(quantiles).tolist()
+        if include_hists:
+            out['hist_edges_ly'] = self.edges.tolist()
+            out['hists'] = {k: h.tolist() for k, h in self.hists.items()}
+        return out
+
+
+def run_voyages(n_walkers, reigns, seed=None, lower_age=LOWER_AGE, upper_age=UPPER_AGE, n_bins=N_BINS,
+                chunk_size=CHUNK_SIZE):
+    """Simulate ``n_walkers`` voyages in chunks and fold them into a VoyageAccumulator.
+
+    The histogram range is the longest possible voyage, so accumulators from
+    separate runs with the same reigns share their edges.
+    """
+    acc = VoyageAccumulator(max_displacement(reigns, lower_age, upper_age), n_bins)
+    for displacement, path_length in iter_voyage_chunks(n_walkers, reigns, seed=seed, lower_age=lower_age,
+                                                        upper_age=upper_age, chunk_size=chunk_size):
+        acc.add(displacement, path_length)
+    return acc
+
+
+def displacement_shells(radii_ly, width_ly=SHELL_WIDTH_LY):
+    """(r1_ly, r2_ly) shells starting at each radius, as ``r1_ly``/``r2_ly`` in g_star_spiral_model.
+
+    E.g. ``displacement_shells(acc.quantile([0.05, 0.5, 0.95]))``.
+    """
+    return [(float(r), float(r) + width_ly) for r in np.atleast_1d(radii_ly)]
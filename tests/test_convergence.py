@@ -0,0 +1,41 @@
+"""Online mean / variance against numpy."""
+
+import numpy as np
+
+from sumerian_kings.convergence import RunningStats
+
+
+def test_running_stats_match_numpy():
+    rng = np.random.default_rng(0)
+    x = rng.lognormal(3.0, 1.5, (10_000, 4))
+    stats = RunningStats((4,))
+    for batch in np.array_split(x, [1, 7, 2000, 2001, 6500]):
+        stats.update(batch)
+    np.testing.assert_array_equal(stats.count, 10_000)
+    np.testing.assert_allclose(stats.mean, x.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(stats.variance, np.var(x, axis=0, ddof=1), rtol=1e-10)
+    np.testing.assert_allclose(stats.sem, np.std(x, axis=0, ddof=1) / np.sqrt(10_000), rtol=1e-10)
+
+
+def test_running_stats_ignore_nans():
+    rng = np.random.default_rng(1)
+    x = rng.normal(5.0, 2.0, (5_000, 3))
+    x[rng.random(x.shape) < 0.3] = np.nan
+    x[:, 2] = np.nan  # a column that never gets a value
+    stats = RunningStats((3,))
+    for batch in np.array_split(x, 9):
+        stats.update(batch)
+    np.testing.assert_array_equal(stats.count, np.sum(~np.isnan(x), axis=0))
+    np.testing.assert_allclose(stats.mean[:2], np.nanmean(x[:, :2], axis=0), rtol=1e-12)
+    np.testing.assert_allclose(stats.variance[:2], np.nanvar(x[:, :2], axis=0, ddof=1), rtol=1e-10)
+    assert np.isnan(stats.variance[2])
+
+
+def test_merge_equals_single_stream():
+    rng = np.random.default_rng(2)
+    a, b = rng.normal(1e6, 1.0, 3_000), rng.normal(1e6 + 3.0, 2.0, 500)
+    merged = RunningStats().update(a).merge(RunningStats().update(b))
+    both = np.concatenate([a, b])
+    assert merged.count == both.size
+    np.testing.assert_allclose(merged.mean, both.mean(), rtol=1e-14)
+    np.testing.assert_allclose(merged.variance, np.var(both, ddof=1), rtol=1e-9)
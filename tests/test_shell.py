@@ -0,0 +1,104 @@
+"""Streaming shell sampler and its reducers."""
+
+import numpy as np
+import pytest
+
+from sumerian_kings.density_grid import DensityGrid
+from sumerian_kings.shell import (LY_TO_PC, ShellAccumulator, compute_sigma0, iter_shell_chunks,
+                                  run_shell_model, sample_shell, shell_volume)
+from sumerian_kings.spiral_arms import min_arm_separation, parametric_arms
+
+
+R0_PC, RD, HZ, RMAX, N_TOTAL = 8122.0, 2600.0, 300.0, 15000.0, 2e10
+R1, R2 = 16408.70211 * LY_TO_PC, 16428.70211 * LY_TO_PC
+SIGMA0 = compute_sigma0(N_TOTAL, RD, RMAX)
+ARMS = parametric_arms(R_ref=R0_PC)
+ARM_HALF_WIDTH = 300.0
+
+
+def _concat(chunks):
+    chunks = list(chunks)
+    return {k: np.concatenate([c[k] for c in chunks]) for k in chunks[0]}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 999, 4096, 10_000])
+def test_chunked_samples_equal_in_memory(chunk_size):
+    n = 10_000
+    whole = sample_shell(n, R1, R2, R0_PC, SIGMA0, RD, HZ, seed=7)
+    chunked = _concat(iter_shell_chunks(n, R1, R2, R0_PC, SIGMA0, RD, HZ, seed=7, chunk_size=chunk_size))
+    assert whole.keys() == chunked.keys()
+    for key in whole:
+        np.testing.assert_array_equal(chunked[key], whole[key], err_msg=key)
+
+
+def test_samples_lie_in_shell():
+    c = sample_shell(5000, R1, R2, R0_PC, SIGMA0, RD, HZ, seed=1)
+    r = np.sqrt(c['x_sun']**2 + c['y_sun']**2 + c['z_sun']**2)
+    assert np.all((r >= R1 * (1 - 1e-12)) & (r <= R2 * (1 + 1e-12)))
+    np.testing.assert_allclose(np.hypot(c['X_gc'], c['Y_gc']), c['R_gc'])
+
+
+def test_run_shell_model_independent_of_chunk_size():
+    kwargs = dict(seed=3, nbins=16)
+    a = run_shell_model(20_000, R1, R2, ARMS, R0_PC, RD, HZ, RMAX, N_TOTAL, ARM_HALF_WIDTH, chunk_size=20_000, **kwargs)
+    b = run_shell_model(20_000, R1, R2, ARMS, R0_PC, RD, HZ, RMAX, N_TOTAL, ARM_HALF_WIDTH, chunk_size=3_000, **kwargs)
+    ra, rb = a.result(), b.result()
+    assert ra['N_mc'] == rb['N_mc'] == 20_000
+    assert ra['frac_points_in_arm'] == rb['frac_points_in_arm']
+    for key in ('N_expected_shell', 'N_expected_arms', 'N_expected_shell_se', 'N_expected_arms_se'):
+        assert ra[key] == pytest.approx(rb[key], rel=1e-12)
+    for ga, gb in zip(a.density_grids(), b.density_grids()):
+        np.testing.assert_allclose(ga, gb, rtol=1e-12, atol=0)
+
+
+def test_accumulator_matches_notebook_estimates():
+    n = 20_000
+    c = sample_shell(n, R1, R2, R0_PC, SIGMA0, RD, HZ, seed=5)
+    in_arm = min_arm_separation(c['R_gc'], c['phi_gc'], ARMS) < ARM_HALF_WIDTH
+    V = shell_volume(R1, R2)
+    res = ShellAccumulator(V).add(c, in_arm).result()
+    assert res['N_expected_shell'] == pytest.approx(np.mean(c['rho']) * V, rel=1e-12)
+    assert res['N_expected_arms'] == pytest.approx(np.mean(c['rho'] * in_arm) * V, rel=1e-12)
+    assert res['frac_points_in_arm'] == np.mean(in_arm)
+    assert res['N_expected_shell_se'] == pytest.approx(np.std(c['rho']) / np.sqrt(n) * V, rel=1e-9)
+
+
+def _accumulator(V, grid=True):
+    edges = np.linspace(-R2, R2, 33)
+    return ShellAccumulator(V, x_edges=edges, y_edges=edges,
+                            grid=DensityGrid((-R2, R2), (-R2, R2), nbins=32, n_levels=3) if grid else None)
+
+
+def test_merged_accumulators_equal_single_run():
+    V = shell_volume(R1, R2)
+    chunks = list(iter_shell_chunks(30_000, R1, R2, R0_PC, SIGMA0, RD, HZ, seed=11, chunk_size=4_000))
+    single = _accumulator(V)
+    parts = [_accumulator(V) for _ in range(3)]
+    for k, chunk in enumerate(chunks):
+        in_arm = min_arm_separation(chunk['R_gc'], chunk['phi_gc'], ARMS) < ARM_HALF_WIDTH
+        single.add(chunk, in_arm)
+        parts[k % 3].add(chunk, in_arm)
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+
+    rs, rm = single.result(), merged.result()
+    assert rm['N_mc'] == rs['N_mc'] == 30_000
+    assert rm['frac_points_in_arm'] == rs['frac_points_in_arm']
+    for key in ('N_expected_shell', 'N_expected_arms', 'N_expected_shell_se', 'N_expected_arms_se'):
+        assert rm[key] == pytest.approx(rs[key], rel=1e-12)
+    for gm, gs in zip(merged.density_grids(), single.density_grids()):
+        np.testing.assert_allclose(gm, gs, rtol=1e-12, atol=0)
+    np.testing.assert_allclose(merged.density_grid().weights, single.density_grid().weights, rtol=1e-12, atol=0)
+    np.testing.assert_array_equal(merged.grid.counts, single.grid.counts)
+
+
+def test_density_grid_sums_to_expected_count():
+    acc = run_shell_model(20_000, R1, R2, ARMS, R0_PC, RD, HZ, RMAX, N_TOTAL, ARM_HALF_WIDTH, seed=2, nbins=8,
+                          grid=DensityGrid((-R2, R2), (-R2, R2), nbins=32, n_levels=3))
+    res = acc.result()
+    hist_in, hist_out = acc.density_grids()
+    assert hist_in.sum() == pytest.approx(res['N_expected_arms'], rel=1e-9)
+    assert hist_in.sum() + hist_out.sum() == pytest.approx(res['N_expected_shell'], rel=1e-9)
+    grid = acc.density_grid()
+    assert grid.weights[0].sum() == pytest.approx(res['N_expected_arms'], rel=1e-9)
+    assert grid.weights.sum() == pytest.approx(res['N_expected_shell'], rel=1e-9)
+
@@ -0,0 +1,80 @@
+"""Spatial-index queries against brute-force sums over every sample."""
+
+import numpy as np
+import pytest
+
+from sumerian_kings.spatial_index import SpatialIndex
+
+
+N_TOTAL = 60_000
+
+
+@pytest.fixture(scope='module')
+def samples():
+    # a thin, clumpy slab like the shell samples: dense near z = 0
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-5000.0, 5000.0, N_TOTAL)
+    y = rng.normal(0.0, 2000.0, N_TOTAL)
+    z = rng.laplace(0.0, 300.0, N_TOTAL)
+    w = rng.exponential(1e-3, N_TOTAL)
+    return np.stack([x, y, z], axis=1), w
+
+
+@pytest.fixture(scope='module', params=[None, 150.0], ids=['default_cells', 'fine_cells'])
+def index(request, samples):
+    P, w = samples
+    return SpatialIndex.build(*P.T, weights=w, cell_size=request.param)
+
+
+def _brute(w, mask):
+    s = w[mask].sum()
+    return s, np.sqrt(max((w[mask]**2).sum() - s * s / N_TOTAL, 0.0)), mask.sum()
+
+
+def _check(res, expected):
+    got = np.stack([res['N_expected'], res['N_expected_se'], res['n_samples']], axis=-1)
+    np.testing.assert_allclose(got, expected, rtol=1e-9, atol=1e-12)
+
+
+def test_radius(samples, index):
+    P, w = samples
+    rng = np.random.default_rng(1)
+    centers = np.column_stack([rng.uniform(-6000, 6000, 200), rng.uniform(-6000, 6000, 200), rng.uniform(-800, 800, 200)])
+    radius = rng.uniform(10.0, 4000.0, 200)
+    expected = [_brute(w, ((P - c)**2).sum(axis=1) <= r * r) for c, r in zip(centers, radius)]
+    _check(index.radius(centers, radius), expected)
+    single = index.radius(centers[0], radius[0])
+    assert single['N_expected'] == pytest.approx(expected[0][0], rel=1e-9)
+
+
+def test_box(samples, index):
+    P, w = samples
+    rng = np.random.default_rng(2)
+    a = rng.uniform(-6000, 6000, (200, 3)) * [1, 1, 0.2]
+    b = a + rng.uniform(0, 5000, (200, 3)) * [1, 1, 0.3]
+    expected = [_brute(w, np.all((P >= lo) & (P <= hi), axis=1)) for lo, hi in zip(a, b)]
+    _check(index.box(a, b), expected)
+
+
+@pytest.mark.parametrize('apex, axis, half_angle, length', [
+    ((0, 0, 0), (1, 0, 0), 10.0, 6000.0),
+    ((100, -200, 50), (0.3, 0.5, 0.8), 30.0, 5200.0),
+    ((0, 0, 0), (-1, 1, 0), 5.0, 8000.0),
+    ((2000, 0, 0), (0, 0, 1), 60.0, 300.0),
+    ((-3000, 1000, 0), (0, -1, 0.1), 89.0, 2500.0),
+])
+def test_cone(samples, index, apex, axis, half_angle, length):
+    P, w = samples
+    v = P - np.asarray(apex, dtype=float)
+    u = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+    r = np.linalg.norm(v, axis=1)
+    mask = (r <= length) & (v @ u >= r * np.cos(np.radians(half_angle)))
+    _check(index.cone(apex, axis, half_angle, length), _brute(w, mask))
+
+
+def test_save_load_round_trip(samples, index, tmp_path):
+    loaded = SpatialIndex.load(index.save(tmp_path / 'index'))
+    centers = samples[0][:50]
+    a, b = index.radius(centers, 700.0), loaded.radius(centers, 700.0)
+    for key in a:
+        np.testing.assert_array_equal(a[key], b[key])
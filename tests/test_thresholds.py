@@ -0,0 +1,42 @@
+"""Inverse of the (log10 f_l, log10 f_i) area fraction."""
+
+import numpy as np
+import pytest
+
+from sumerian_kings.thresholds import LOG10_FI_RANGE, LOG10_FL_RANGE, area_fraction, offset_for_area_fraction
+
+
+BOXES = [(LOG10_FL_RANGE, LOG10_FI_RANGE), ((0.0, 1.0), (0.0, 1.0)), ((-3.0, 0.0), (-1.0, 0.0)),
+         ((-1.0, 0.0), (-5.0, -1.0))]
+
+
+@pytest.mark.parametrize('x_range, y_range', BOXES)
+def test_offset_round_trip(x_range, y_range):
+    frac = np.linspace(0.0, 1.0, 401)
+    s = offset_for_area_fraction(frac, x_range, y_range)
+    np.testing.assert_allclose(area_fraction(s, x_range, y_range), frac, atol=1e-12)
+    # and back: offsets inside the box's diagonal span
+    lo, hi = x_range[0] + y_range[0], x_range[1] + y_range[1]
+    s = np.linspace(lo, hi, 401)
+    np.testing.assert_allclose(offset_for_area_fraction(area_fraction(s, x_range, y_range), x_range, y_range), s,
+                               atol=1e-9)
+
+
+@pytest.mark.parametrize('x_range, y_range', BOXES)
+def test_area_fraction_against_grid(x_range, y_range):
+    n = 1000
+    x = np.linspace(*x_range, n + 1)
+    y = np.linspace(*y_range, n + 1)
+    xc, yc = 0.5 * (x[:-1] + x[1:]), 0.5 * (y[:-1] + y[1:])
+    total = xc[:, None] + yc[None, :]
+    for frac in (0.01, 0.25, 0.5, 0.9):
+        s = offset_for_area_fraction(frac, x_range, y_range)
+        assert np.mean(total >= s) == pytest.approx(frac, abs=3e-3)
+
+
+def test_extremes():
+    (x0, x1), (y0, y1) = LOG10_FL_RANGE, LOG10_FI_RANGE
+    assert offset_for_area_fraction(1.0) == pytest.approx(x0 + y0)
+    assert offset_for_area_fraction(0.0) == pytest.approx(x1 + y1)
+    assert area_fraction(x0 + y0 - 1.0) == 1.0
+    assert area_fraction(x1 + y1 + 1.0) == 0.0